@@ -0,0 +1,44 @@
+import pandas as pd
+
+from pulse_data import KEY
+
+# The full-history frame models the dashboard no longer uses, kept only so
+# the benchmarks can compare them against the per-page query API.
+#
+# build_data is the keyed model that held every transaction fact in memory;
+# merged_frame is the original outer merge of fetch_data().
+
+
+def prepare_frame(df):
+    # df already has the declared dtypes (pulse_data.fetch_table or dtypes.apply_schema)
+    return df.set_index(KEY).sort_index()
+
+
+def build_state_rollup(transaction):
+    # One row per (Year, Quarter, State). The payment categories in
+    # `transaction` partition the state total, so summing them gives the
+    # state-quarter totals without touching the district or entity facts.
+    rollup = transaction.groupby(level=['Year', 'Quarter', 'State'], observed=True)[
+        ['Transaction_count', 'Transaction_amount']].sum()
+    return rollup.sort_index()
+
+
+def build_data(frames):
+    data = dict(frames)
+    data['state_rollup'] = build_state_rollup(frames['transaction'])
+    return data
+
+
+def merged_frame(df1, df2, df3):
+    # The legacy Cartesian model
+    df2 = df2.rename(columns={'Transaction_amount': 'map_Transaction_amount',
+                              'Transaction_count': 'map_Transaction_count'})
+    df3 = df3.rename(columns={'Transaction_amount': 'top_Transaction_amount',
+                              'Transaction_count': 'top_Transaction_count'})
+    df_merged = pd.merge(df1, df2, on=KEY, how='outer')
+    df_merged = pd.merge(df_merged, df3, on=KEY, how='outer')
+    return df_merged
+
+
+def frame_memory(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,74 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import dtypes
+from benchmarks import legacy
+
+# Compares the legacy outer-merge in fetch_data() against the keyed data model.
+#
+#   python -m benchmarks.merge_memory --states 36 --years 6 --districts 20 --entities 10
+
+
+def synthetic_frames(states, years, names, districts, entities, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = [(f'State {s}', 2018 + y, q) for s in range(states) for y in range(years) for q in range(1, 5)]
+
+    def fact(dimension, values):
+        rows = [(s, y, q, v) for (s, y, q) in keys for v in values]
+        df = pd.DataFrame(rows, columns=['State', 'Year', 'Quarter', dimension])
+        df['Transaction_count'] = rng.integers(1, 10 ** 6, len(df)).astype(float)
+        df['Transaction_amount'] = rng.random(len(df)) * 10 ** 9
+        return dtypes.apply_schema(df)
+
+    df1 = fact('name', [f'Payment {i}' for i in range(names)])
+    df2 = fact('Districts', [f'District {i}' for i in range(districts)])
+    df3 = fact('Entityname', [f'Entity {i}' for i in range(entities)])
+    return df1, df2, df3
+
+
+def run(states, years, names, districts, entities):
+    df1, df2, df3 = synthetic_frames(states, years, names, districts, entities)
+
+    start = time.perf_counter()
+    merged = legacy.merged_frame(df1, df2, df3)
+    legacy_totals = merged.groupby(['Year', 'Quarter', 'State'])['Transaction_amount'].sum()
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames = {
+        'transaction': legacy.prepare_frame(df1),
+        'map_trans': legacy.prepare_frame(df2),
+        'top_transaction': legacy.prepare_frame(df3),
+    }
+    data = legacy.build_data(frames)
+    keyed_time = time.perf_counter() - start
+
+    keyed_rows = sum(len(frames[name]) for name in frames)
+    keyed_memory = sum(legacy.frame_memory(frames[name]) for name in frames)
+    true_total = df1['Transaction_amount'].sum()
+
+    print(f"{'model':<10}{'rows':>14}{'memory (MB)':>14}{'build (s)':>12}{'amount total':>22}")
+    print(f"{'merged':<10}{len(merged):>14,}{legacy.frame_memory(merged) / 2 ** 20:>14.1f}"
+          f"{legacy_time:>12.3f}{legacy_totals.sum():>22,.0f}")
+    print(f"{'keyed':<10}{keyed_rows:>14,}{keyed_memory / 2 ** 20:>14.1f}"
+          f"{keyed_time:>12.3f}{data['state_rollup']['Transaction_amount'].sum():>22,.0f}")
+    print(f"rollup rows: {len(data['state_rollup']):,}, "
+          f"legacy over-count factor: {legacy_totals.sum() / true_total:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the outer-merge against the keyed data model')
+    parser.add_argument('--states', type=int, default=36)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--names', type=int, default=5)
+    parser.add_argument('--districts', type=int, default=20)
+    parser.add_argument('--entities', type=int, default=10)
+    args = parser.parse_args()
+    run(args.states, args.years, args.names, args.districts, args.entities)
+
+
+if __name__ == '__main__':
+    main()
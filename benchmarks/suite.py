@@ -0,0 +1,384 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows has no getrusage; peak RSS is then not recorded
+    resource = None
+
+from benchmarks import synthetic
+from fileio import write_text
+
+# End-to-end benchmark suite over a synthetic pulse-master tree.
+#
+# Each scenario runs in a fresh process, so its peak RSS is its own, and
+# records wall time of the measured step, peak RSS and the rows it
+# produced. Scenarios run in order and hand their output to the next one
+# through the work directory:
+#
+#   ingestion    parse the JSON tree into frames (ingest.pipeline)
+#   db_load      bulk load, migrate and refresh the summaries (SQLite or MySQL)
+#   stream_load  parse and load in fixed-size chunks (ingest.pipeline.stream), SQLite
+#   data_load    dashboard startup: get_keys() and the first data page's reads, cold cache
+#   legacy_merge the old outer merge of fetch_data(), for comparison
+#   aggregation  the per-page query API over every quarter, cold cache
+#   figures      Plotly figure build and serialization for every quarter
+#
+# Results go to a JSON file; with a stored baseline at the same scale, any
+# scenario slower, bigger or with different row counts beyond the tolerance
+# is flagged and the exit status is 1.
+#
+#   python -m benchmarks.suite --states 36 --districts 20 --years 4
+#   python -m benchmarks.suite --save-baseline
+#   python -m benchmarks.suite --mysql --database phonepe_pulse_bench
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, 'results.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+
+BenchConfig = namedtuple('BenchConfig', ['work_dir', 'mysql', 'database', 'workers', 'mode'])
+
+
+def data_root(config):
+    return os.path.join(config.work_dir, 'data')
+
+
+def frames_path(config):
+    return os.path.join(config.work_dir, 'frames.pkl')
+
+
+def sqlite_path(config):
+    return os.path.join(config.work_dir, 'pulse.sqlite')
+
+
+def snapshot_dir(config):
+    return os.path.join(config.work_dir, 'snapshot')
+
+
+@contextmanager
+def timed(result):
+    # Only the code inside the block counts towards the scenario's wall time
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        result['seconds'] += time.perf_counter() - start
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def configure_data_source(config):
+    # Points the dashboard modules at the benchmark database or its snapshot
+    import db
+    import pulse_cache
+    import pulse_data
+    import snapshot
+
+    snapshot.SNAPSHOT_DIR = snapshot_dir(config)
+    snapshot.reset_summary_connection()
+    if config.mysql:
+        db.CONFIG['database'] = config.database
+        pulse_data.DATA_SOURCE = 'mysql'
+    else:
+        pulse_data.DATA_SOURCE = 'parquet'
+    pulse_cache.CACHE.invalidate()
+
+
+def connect(config):
+    import db
+
+    if not config.mysql:
+        return sqlite3.connect(sqlite_path(config))
+    conn = db.connect(database=None, allow_local_infile=config.mode == 'infile')
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{config.database}`")
+    cursor.close()
+    conn.database = config.database
+    return conn
+
+
+def scenario_ingestion(config, result):
+    import pandas as pd
+    from ingest import pipeline
+
+    with timed(result):
+        ingested = pipeline.run(data_root(config), workers=config.workers, full=True)
+    result['rows'] = sum(len(df) for df in ingested.frames.values())
+    pd.to_pickle(ingested.frames, frames_path(config))
+
+
+def scenario_db_load(config, result):
+    import pandas as pd
+
+    import schema
+    import snapshot
+    from ingest import load
+
+    frames = pd.read_pickle(frames_path(config))
+    if not config.mysql and os.path.exists(sqlite_path(config)):
+        os.remove(sqlite_path(config))
+    conn = connect(config)
+    with timed(result):
+        for name, df in frames.items():
+            load.write_frame(conn, name, df, config.mode)
+        schema.migrate(conn)
+        schema.refresh_summaries(conn)
+    result['rows'] = sum(len(df) for df in frames.values())
+
+    # The no-database path of the later scenarios reads this snapshot
+    if not config.mysql:
+        snapshot.SNAPSHOT_DIR = snapshot_dir(config)
+        snapshot.export(conn=conn)
+    conn.close()
+
+
+def scenario_stream_load(config, result):
+    from ingest import load, pipeline
+
+    # Its own file, so the database the later scenarios read is left alone
+    path = os.path.join(config.work_dir, 'stream.sqlite')
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    with timed(result):
+        streamed = pipeline.stream(data_root(config), load.frame_writer(conn),
+                                   workers=config.workers, full=True)
+    result['rows'] = sum(streamed.rows.values())
+    conn.close()
+
+
+def scenario_data_load(config, result):
+    import pulse_data
+
+    configure_data_source(config)
+    with timed(result):
+        # What a fresh session waits for: the selector keys, then the Explore
+        # Transaction Data reads at the selectboxes' defaults
+        years, quarters, states = pulse_data.get_keys()
+        selection = (states[0], years[0], quarters[0])
+        page = pulse_data.fetch_concurrent({
+            'state totals': lambda: pulse_data.get_state_rollup(years[0], quarters[0]),
+            'payment breakdown': lambda: pulse_data.get_payment_breakdown(*selection),
+            'district breakdown': lambda: pulse_data.get_district_breakdown(*selection),
+        })
+    if page.errors:
+        raise next(iter(page.errors.values()))
+    result['rows'] = sum(len(df) for df in page.results.values())
+
+
+def scenario_legacy_merge(config, result):
+    import pulse_data
+    from benchmarks import legacy
+
+    configure_data_source(config)
+    frames = [pulse_data.fetch_table(name, columns) for name, columns in pulse_data.TRANSACTION_COLUMNS.items()]
+    with timed(result):
+        merged = legacy.merged_frame(*frames)
+        merged.groupby(['Year', 'Quarter', 'State'], observed=True)['Transaction_amount'].sum()
+    result['rows'] = len(merged)
+
+
+def scenario_aggregation(config, result):
+    import pulse_data
+    import trends
+
+    configure_data_source(config)
+    rows = 0
+    with timed(result):
+        years, quarters, states = pulse_data.get_keys()
+        for year in years:
+            for quarter in quarters:
+                rows += len(pulse_data.get_state_rollup(year, quarter))
+                for table in pulse_data.USER_COLUMNS:
+                    rows += len(pulse_data.get_slice(table, year, quarter))
+        # Per-state drill-downs for the latest quarter, as a user paging through states would
+        for state in states:
+            rows += len(pulse_data.get_payment_breakdown(state, years[-1], quarters[-1]))
+            rows += len(pulse_data.get_district_breakdown(state, years[-1], quarters[-1]))
+            rows += len(pulse_data.get_district_breakdown(state, years[-1], quarters[-1], 'map_user'))
+        for measure in ['Transaction_amount', 'Transaction_count']:
+            rows += trends.state_cube(measure).size
+    result['rows'] = rows
+
+
+def scenario_figures(config, result):
+    import plotly.express as px
+
+    import geo
+    import pulse_data
+    import trends
+
+    configure_data_source(config)
+    years, quarters, states = pulse_data.get_keys()
+    periods = [(year, quarter) for year in years for quarter in quarters]
+    # The data is read first, so only figure construction and serialization are timed
+    rollups = {period: pulse_data.get_state_rollup(*period) for period in periods}
+    users = {period: pulse_data.get_slice('agg_user', *period) for period in periods}
+    matrix = trends.state_cube('Transaction_amount')
+    states_geojson = geo.load_states() if os.path.exists(geo.STATES_FILE) else None
+
+    figures = []
+    with timed(result):
+        for period in periods:
+            rollup, user = rollups[period], users[period]
+            for measure in ['Transaction_amount', 'Transaction_count']:
+                figures.append(px.bar(rollup, x='State', y=measure))
+                if states_geojson is not None:
+                    located = rollup.assign(ST_NM=rollup['State'].map(geo.state_feature_name))
+                    figures.append(px.choropleth(located, geojson=states_geojson, locations='ST_NM',
+                                                 featureidkey='properties.ST_NM', color=measure))
+            if not user.empty:
+                figures.append(px.bar(user.groupby('Brands', observed=True)['Transaction_count'].sum()
+                                      .reset_index(), x='Brands', y='Transaction_count'))
+        if not matrix.empty:
+            figures.append(px.line(trends.long_format(matrix, 'State', 'Transaction_amount'),
+                                   x='Period', y='Transaction_amount', color='State'))
+        result['bytes'] = sum(len(figure.to_json()) for figure in figures)
+    result['rows'] = len(figures)
+
+
+SCENARIOS = {
+    'ingestion': scenario_ingestion,
+    'db_load': scenario_db_load,
+    'stream_load': scenario_stream_load,
+    'data_load': scenario_data_load,
+    'legacy_merge': scenario_legacy_merge,
+    'aggregation': scenario_aggregation,
+    'figures': scenario_figures,
+}
+
+
+def run_scenario(name, config):
+    # Entry point of the scenario process
+    result = {'seconds': 0.0, 'rows': 0}
+    SCENARIOS[name](config, result)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_isolated(name, config):
+    # spawn, so the child does not inherit the parent's memory or imported modules
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_scenario, name, config).result()
+
+
+def prepare_data(config, scale, seed):
+    # The tree is only rewritten when the scale or seed changes
+    marker = os.path.join(config.work_dir, 'scale.json')
+    wanted = {'scale': scale._asdict(), 'seed': seed}
+    if os.path.exists(marker):
+        with open(marker, 'r') as f:
+            if json.load(f) == wanted:
+                return
+    shutil.rmtree(data_root(config), ignore_errors=True)
+    files = synthetic.generate(data_root(config), scale, seed=seed)
+    print(f"Generated {files} files in {data_root(config)}")
+    with open(marker, 'w') as f:
+        json.dump(wanted, f)
+
+
+def compare(results, baseline, tolerance):
+    # List of (scenario, message) for every regression against the baseline
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+        for field in ['seconds', 'peak_rss_mb']:
+            if current.get(field) is None or not previous.get(field):
+                continue
+            change = current[field] / previous[field] - 1
+            if change > tolerance:
+                regressions.append((name, f"{field} {previous[field]:.2f} -> {current[field]:.2f} (+{change:.0%})"))
+        if current['rows'] != previous['rows']:
+            regressions.append((name, f"rows {previous['rows']:,} -> {current['rows']:,}"))
+    return regressions
+
+
+def write_json(path, payload):
+    write_text(path, json.dumps(payload, indent=1, sort_keys=True))
+
+
+def print_results(results):
+    print(f"{'scenario':<14}{'seconds':>10}{'peak RSS (MB)':>15}{'rows':>14}")
+    for name, result in results['scenarios'].items():
+        rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+        print(f"{name:<14}{result['seconds']:>10.3f}{rss:>15}{result['rows']:>14,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingestion, loading, aggregation and figures')
+    parser.add_argument('--scenarios', nargs='*', choices=list(SCENARIOS), help='default: all, in order')
+    parser.add_argument('--work-dir', default=os.path.join(BENCH_DIR, 'work'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='ingestion parser processes, default: one per core')
+    parser.add_argument('--mode', default='executemany', help='ingest.load mode for db_load')
+    parser.add_argument('--mysql', action='store_true', help='load into MySQL (db.CONFIG) instead of SQLite')
+    parser.add_argument('--database', default='phonepe_pulse_bench', help='MySQL database the benchmark writes')
+    parser.add_argument('--results', default=DEFAULT_RESULTS)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed fractional slowdown or growth before flagging')
+    synthetic.add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    scale = synthetic.scale_from_args(args)
+    config = BenchConfig(os.path.abspath(args.work_dir), args.mysql, args.database, args.workers, args.mode)
+    os.makedirs(config.work_dir, exist_ok=True)
+    prepare_data(config, scale, args.seed)
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scale': scale._asdict(),
+        'seed': args.seed,
+        'backend': 'mysql' if args.mysql else 'sqlite',
+        'python': sys.version.split()[0],
+        'scenarios': {},
+    }
+    for name in args.scenarios or SCENARIOS:
+        print(f"Running {name}...")
+        results['scenarios'][name] = run_isolated(name, config)
+    print_results(results)
+    write_json(args.results, results)
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        return
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if (baseline['scale'], baseline['seed'], baseline['backend']) != (results['scale'], results['seed'],
+                                                                      results['backend']):
+        print("Baseline was recorded at a different scale, seed or backend; not compared")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for name, message in regressions:
+        print(f"REGRESSION {name}: {message}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import random
+from collections import namedtuple
+
+from ingest.specs import DATASETS
+from normalize import STATE_SLUGS
+
+# Synthetic pulse-master data/ tree for the benchmarks.
+#
+# Writes one JSON file per (dataset, state, year, quarter) in the same layout
+# and document shape as PhonePe's pulse repository, so the real ingestion
+# pipeline runs on it unchanged. The size is scaled by the number of states,
+# districts per state, years and payment categories; the same seed always
+# produces the same tree.
+#
+#   python -m benchmarks.synthetic --out bench_data --states 36 --districts 30 --years 6
+
+Scale = namedtuple('Scale', ['states', 'districts', 'years', 'categories', 'brands', 'pincodes'])
+
+DEFAULT_SCALE = Scale(states=36, districts=20, years=4, categories=5, brands=10, pincodes=10)
+FIRST_YEAR = 2018
+
+PAYMENT_CATEGORIES = ['Recharge & bill payments', 'Peer-to-peer payments', 'Merchant payments',
+                      'Financial Services', 'Others']
+BRANDS = ['Xiaomi', 'Samsung', 'Vivo', 'Oppo', 'Realme', 'Apple', 'Motorola', 'OnePlus', 'Huawei', 'Tecno',
+          'Gionee', 'Infinix', 'Asus', 'Lava', 'Lenovo', 'Lyf', 'COOLPAD', 'HMD Global', 'Micromax']
+
+
+def state_slugs(count):
+    # Real slugs first, so the names normalize like the live data
+    slugs = sorted(STATE_SLUGS)[:count]
+    return slugs + [f'synthetic-state-{i}' for i in range(len(slugs), count)]
+
+
+def names(base, count, prefix):
+    return base[:count] + [f'{prefix} {i}' for i in range(len(base), count)]
+
+
+def metric(rng):
+    count = rng.randint(1, 10 ** 7)
+    return {'type': 'TOTAL', 'count': count, 'amount': count * rng.uniform(50, 5000)}
+
+
+def district_names(state, count):
+    return [f'{state.replace("-", " ")} {i} district' for i in range(count)]
+
+
+def build_document(dataset, state, scale, rng):
+    # The 'data' payload each ingest.specs extractor reads
+    districts = district_names(state, scale.districts)
+    if dataset in ('insurance', 'transaction'):
+        categories = ['Insurance'] if dataset == 'insurance' else names(PAYMENT_CATEGORIES, scale.categories,
+                                                                         'Category')
+        return {'transactionData': [{'name': name, 'paymentInstruments': [metric(rng)]} for name in categories]}
+    if dataset == 'agg_user':
+        brands = names(BRANDS, scale.brands, 'Brand')
+        counts = [rng.randint(1, 10 ** 6) for _ in brands]
+        total = sum(counts)
+        return {'aggregated': {'registeredUsers': total, 'appOpens': total * rng.randint(1, 20)},
+                'usersByDevice': [{'brand': brand, 'count': count, 'percentage': count / total}
+                                  for brand, count in zip(brands, counts)]}
+    if dataset in ('map_insurance', 'map_trans'):
+        return {'hoverDataList': [{'name': district, 'metric': [metric(rng)]} for district in districts]}
+    if dataset == 'map_user':
+        return {'hoverData': {district: {'registeredUsers': rng.randint(1, 10 ** 6),
+                                         'appOpens': rng.randint(0, 10 ** 8)} for district in districts}}
+    pincodes = [str(100000 + rng.randint(0, 899999)) for _ in range(scale.pincodes)]
+    if dataset == 'top_user':
+        return {'states': None,
+                'districts': [{'name': district, 'registeredUsers': rng.randint(1, 10 ** 6)}
+                              for district in districts[:10]],
+                'pincodes': [{'name': pincode, 'registeredUsers': rng.randint(1, 10 ** 5)} for pincode in pincodes]}
+    # top_insurance and top_transaction
+    return {'states': None,
+            'districts': [{'entityName': district, 'metric': metric(rng)} for district in districts[:10]],
+            'pincodes': [{'entityName': pincode, 'metric': metric(rng)} for pincode in pincodes]}
+
+
+def generate(out_dir, scale=DEFAULT_SCALE, dataset_names=None, seed=0):
+    # Returns the number of files written
+    rng = random.Random(seed)
+    files = 0
+    for dataset in dataset_names or DATASETS:
+        root = os.path.join(out_dir, DATASETS[dataset].path)
+        for state in state_slugs(scale.states):
+            for year in range(FIRST_YEAR, FIRST_YEAR + scale.years):
+                year_path = os.path.join(root, state, str(year))
+                os.makedirs(year_path, exist_ok=True)
+                for quarter in range(1, 5):
+                    document = {
+                        'success': True,
+                        'code': 'SUCCESS',
+                        'data': build_document(dataset, state, scale, rng),
+                        'responseTimestamp': 1630000000000 + files,
+                    }
+                    with open(os.path.join(year_path, f'{quarter}.json'), 'w') as f:
+                        json.dump(document, f)
+                    files += 1
+    return files
+
+
+def add_scale_arguments(parser):
+    for field in Scale._fields:
+        parser.add_argument(f'--{field}', type=int, default=getattr(DEFAULT_SCALE, field))
+
+
+def scale_from_args(args):
+    return Scale(**{field: getattr(args, field) for field in Scale._fields})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic pulse-master data/ tree')
+    parser.add_argument('--out', required=True, help='directory to write the data/ tree into')
+    parser.add_argument('--datasets', nargs='*', choices=sorted(DATASETS), help='default: all datasets')
+    parser.add_argument('--seed', type=int, default=0)
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+    files = generate(args.out, scale_from_args(args), args.datasets, args.seed)
+    print(f"Wrote {files} files to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import dtypes
+import pulse_cache
+import pulse_data
+import schema
+
+# In-process aggregate cube for the Insights questions.
+#
+# The four summary tables are the finest partial aggregates the questions
+# need: (source, State, Year, Quarter), (source, State, District, Year,
+# Quarter), (State, Payment, Year, Quarter) and (State, Brand, Year,
+# Quarter). They are read once per data version into NumPy arrays, with
+# every dimension factorized to integer codes. A query sums one measure over
+# any subset of a fact's dimensions with a single np.bincount on the
+# combined group code, then orders and limits the groups, so a question is a
+# declared Query instead of its own SQL scan.
+
+# measure: one of schema.SUMMARY_MEASURES; dimensions: the group-by columns;
+# filters: {dimension: value}; order: 'desc' (largest first, ties by the
+# dimensions descending) or 'dimensions' (ascending); limit: top-N or None
+Query = namedtuple('Query', ['measure', 'dimensions', 'filters', 'order', 'limit'],
+                   defaults=[None, 'desc', None])
+
+# codes: {dimension: int32 codes}; labels: {dimension: sorted Index}; measures: {measure: array}
+Fact = namedtuple('Fact', ['dimensions', 'codes', 'labels', 'measures'])
+
+MEASURE_COLUMNS = ', '.join(f's.{measure}' for measure in schema.SUMMARY_MEASURES)
+
+# Fact tables in the order a query is matched against them, smallest first
+FACT_SQL = {
+    'state_quarter': (['source', 'State', 'Year', 'Quarter'], f"""
+        SELECT s.source, d.State, s.Year, s.Quarter, {MEASURE_COLUMNS}
+        FROM summary_state_quarter s JOIN dim_state d ON d.state_id = s.state_id"""),
+    'state_payment': (['State', 'Payment', 'Year', 'Quarter'], f"""
+        SELECT d.State, s.name, s.Year, s.Quarter, {MEASURE_COLUMNS}
+        FROM summary_state_payment s JOIN dim_state d ON d.state_id = s.state_id"""),
+    'state_brand': (['State', 'Brand', 'Year', 'Quarter'], f"""
+        SELECT d.State, s.Brands, s.Year, s.Quarter, {MEASURE_COLUMNS}
+        FROM summary_state_brand s JOIN dim_state d ON d.state_id = s.state_id"""),
+    'state_district': (['source', 'State', 'District', 'Year', 'Quarter'], f"""
+        SELECT s.source, d.State, x.District, s.Year, s.Quarter, {MEASURE_COLUMNS}
+        FROM summary_state_district s
+        JOIN dim_state d ON d.state_id = s.state_id
+        JOIN dim_district x ON x.district_id = s.district_id"""),
+}
+
+_cube = None
+_cube_version = None
+_cube_lock = threading.Lock()
+
+
+def build_fact(name):
+    dimensions, sql = FACT_SQL[name]
+    rows = pulse_data.summary_rows(sql, name=f'cube_{name}')
+    df = dtypes.typed_frame(rows, dimensions + schema.SUMMARY_MEASURES)
+    codes, labels = {}, {}
+    for dimension in dimensions:
+        dimension_codes, dimension_labels = pd.factorize(df[dimension].astype(object), sort=True)
+        codes[dimension] = dimension_codes.astype(np.int32)
+        labels[dimension] = pd.Index(dimension_labels)
+    measures = {measure: df[measure].to_numpy() for measure in schema.SUMMARY_MEASURES}
+    return Fact(dimensions, codes, labels, measures)
+
+
+def get_cube():
+    # {fact name: Fact}, rebuilt only when the loader publishes a new data version
+    global _cube, _cube_version
+    version = pulse_cache.data_version()
+    with _cube_lock:
+        if _cube is None or _cube_version != version:
+            _cube = {name: build_fact(name) for name in FACT_SQL}
+            _cube_version = version
+        return _cube
+
+
+def match_fact(cube, query):
+    wanted = set(query.dimensions) | set(query.filters or {})
+    for name, fact in cube.items():
+        if wanted <= set(fact.dimensions):
+            return fact
+    raise ValueError(f"No fact has the dimensions {sorted(wanted)}")
+
+
+def run_query(cube, query):
+    fact = match_fact(cube, query)
+    values = fact.measures[query.measure]
+
+    mask = np.ones(len(values), dtype=bool)
+    for dimension, value in (query.filters or {}).items():
+        code = fact.labels[dimension].get_indexer([value])[0]
+        mask &= fact.codes[dimension] == code
+
+    # One group code per row: the dimensions' codes in mixed radix
+    sizes = [len(fact.labels[dimension]) for dimension in query.dimensions]
+    group = np.zeros(int(mask.sum()), dtype=np.int64)
+    for dimension, size in zip(query.dimensions, sizes):
+        group = group * size + fact.codes[dimension][mask]
+    groups = int(np.prod(sizes, dtype=np.int64))
+    totals = np.bincount(group, weights=values[mask], minlength=groups)
+    present = np.flatnonzero(np.bincount(group, minlength=groups))
+
+    result = {}
+    remainder = present
+    for dimension, size in reversed(list(zip(query.dimensions, sizes))):
+        result[dimension] = fact.labels[dimension].take(remainder % size)
+        remainder = remainder // size
+    df = pd.DataFrame({dimension: np.asarray(result[dimension]) for dimension in query.dimensions})
+    total = totals[present]
+    # bincount sums in float64, which is exact for counts below 2**53
+    df[query.measure] = total.round().astype(np.int64) if values.dtype.kind == 'i' else total
+
+    # Group codes already run in ascending dimension order
+    if query.order == 'desc':
+        df = df.sort_values([query.measure] + list(query.dimensions), ascending=False, kind='stable')
+    if query.limit is not None:
+        df = df.head(query.limit)
+    return df.reset_index(drop=True)
+
+
+def query(spec):
+    # Results are memoized per spec and data version like the other page reads
+    return pulse_cache.cached(('cube', spec.measure, tuple(spec.dimensions),
+                               tuple(sorted((spec.filters or {}).items())), spec.order, spec.limit),
+                              lambda: run_query(get_cube(), spec))
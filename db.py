@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import mysql.connector
+import pandas as pd
+from mysql.connector import pooling
+
+import perf
+
+# Query gateway for the dashboard.
+#
+# Every read goes through one MySQLConnectionPool per process. Credentials,
+# pool size and timeouts come from the environment, cursors and connections
+# are always closed, and the time spent waiting for a pooled connection and
+# running each query is recorded for metrics().
+
+CONFIG = {
+    'host': os.environ.get('PULSE_DB_HOST', 'localhost'),
+    'port': int(os.environ.get('PULSE_DB_PORT', 3306)),
+    'user': os.environ.get('PULSE_DB_USER', 'root'),
+    'password': os.environ.get('PULSE_DB_PASSWORD', 'root'),
+    'database': os.environ.get('PULSE_DB_NAME', 'phonepe_pulse'),
+    'auth_plugin': 'mysql_native_password',
+    'charset': 'utf8mb4',
+    'connection_timeout': int(os.environ.get('PULSE_DB_CONNECT_TIMEOUT', 10)),
+}
+
+# mysql-connector caps a pool at 32 connections
+POOL_SIZE = min(int(os.environ.get('PULSE_DB_POOL_SIZE', 5)), pooling.CNX_POOL_MAXSIZE)
+POOL_TIMEOUT = float(os.environ.get('PULSE_DB_POOL_TIMEOUT', 30))
+METRIC_SAMPLES = 1000
+
+_pool = None
+_pool_lock = threading.Lock()
+# MySQLConnectionPool raises at once when exhausted; this makes callers wait instead
+_pool_slots = threading.BoundedSemaphore(POOL_SIZE)
+
+_metrics_lock = threading.Lock()
+_pool_waits = deque(maxlen=METRIC_SAMPLES)
+_query_latency = defaultdict(lambda: deque(maxlen=METRIC_SAMPLES))
+
+
+# Base class of every error a gateway call raises
+Error = mysql.connector.Error
+
+
+class PoolTimeout(Error):
+    pass
+
+
+class QueryTimeout(Error):
+    pass
+
+
+def connect(**overrides):
+    # Plain connection for the loader and migrations, with the same settings as the pool
+    return mysql.connector.connect(**dict(CONFIG, **overrides))
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pooling.MySQLConnectionPool(pool_name='pulse', pool_size=POOL_SIZE, **CONFIG)
+        return _pool
+
+
+@contextmanager
+def connection():
+    start = time.perf_counter()
+    if not _pool_slots.acquire(timeout=POOL_TIMEOUT):
+        raise PoolTimeout(f"No database connection free after {POOL_TIMEOUT}s")
+    try:
+        conn = get_pool().get_connection()
+        with _metrics_lock:
+            _pool_waits.append(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            # Returns the connection to the pool
+            conn.close()
+    finally:
+        _pool_slots.release()
+
+
+def fetch(sql, params=None, name=None):
+    name = name or sql.split()[0].lower()
+    with connection() as conn, perf.span(f'query.{name}') as span:
+        start = time.perf_counter()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params or ())
+            rows = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
+        finally:
+            cursor.close()
+        span['rows'] = len(rows)
+        with _metrics_lock:
+            _query_latency[name].append(time.perf_counter() - start)
+    return columns, rows
+
+
+def fetchall(sql, params=None, name=None):
+    return fetch(sql, params, name)[1]
+
+
+def query(sql, params=None, name=None):
+    columns, rows = fetch(sql, params, name)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0, 'mean': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'count': len(samples),
+        'mean': sum(samples) / len(samples),
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'max': samples[-1],
+    }
+
+
+def metrics():
+    with _metrics_lock:
+        return {
+            'pool_size': POOL_SIZE,
+            'pool_wait': _summary(_pool_waits),
+            'queries': {name: _summary(samples) for name, samples in _query_latency.items()},
+        }
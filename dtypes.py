@@ -0,0 +1,135 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from normalize import normalize_states
+
+# Declared in-memory types for every frame the dashboard builds.
+#
+# Dimensions are categoricals, Year/Quarter are int16/int8, counts int64 and
+# amounts float64, whatever the source handed back: object strings, int64
+# partition values from Parquet, or Decimal objects from a MySQL SUM().
+# apply_schema() converts a frame at load time and, unless
+# PULSE_DTYPE_VALIDATE=0, checks that no value or null changed on the way;
+# a conversion that would lose data raises SchemaError instead.
+#
+#   python dtypes.py --tables transaction map_user
+
+SCHEMA = {
+    'State': 'category',
+    'name': 'category',
+    'Districts': 'category',
+    'Entityname': 'category',
+    'Pincodes': 'category',
+    'Brands': 'category',
+    'Year': 'int16',
+    'Quarter': 'int8',
+    'Transaction_count': 'int64',
+    'RegisteredUser': 'int64',
+    'AppOpens': 'int64',
+    'Transaction_amount': 'float64',
+    'Percentage': 'float64',
+}
+
+VALIDATE = os.environ.get('PULSE_DTYPE_VALIDATE', '1') != '0'
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _is_decimal_column(series):
+    # SUM() over MySQL integer or DECIMAL columns comes back as Decimal objects
+    if series.dtype != object:
+        return False
+    first = series.first_valid_index()
+    return first is not None and type(series[first]).__name__ == 'Decimal'
+
+
+def target_dtype(column, series, schema):
+    if column in schema:
+        return schema[column]
+    if _is_decimal_column(series):
+        # Undeclared aggregate, e.g. an Insights alias: integral sums become int64
+        values = series.dropna()
+        return 'int64' if (values == values.map(int)).all() else 'float64'
+    return None
+
+
+def _check(column, original, converted, dtype):
+    if (original.isna().to_numpy() != converted.isna().to_numpy()).any():
+        raise SchemaError(f"{column}: converting to {dtype} changed which values are missing")
+    if not dtype.startswith('int'):
+        return
+    # Vectorized for numeric sources; Decimal objects compare one by one
+    as_type = None if original.dtype.kind in 'iuf' else object
+    if not (original.to_numpy(dtype=as_type) == converted.to_numpy(dtype=as_type)).all():
+        raise SchemaError(f"{column}: values do not fit {dtype}")
+
+
+def convert(column, series, dtype, validate=VALIDATE):
+    if dtype == 'category':
+        if column == 'State':
+            return pd.Series(normalize_states(series), index=series.index, name=series.name)
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if series.dtype == dtype:
+        return series
+    try:
+        converted = series.astype(dtype)
+    except (TypeError, ValueError) as err:
+        raise SchemaError(f"{column}: cannot convert {series.dtype} to {dtype}: {err}") from err
+    if validate:
+        _check(column, series, converted, dtype)
+    return converted
+
+
+def apply_schema(df, schema=SCHEMA, validate=VALIDATE):
+    # In place on df's columns; columns the schema does not know keep their type
+    for column in df.columns:
+        dtype = target_dtype(column, df[column], schema)
+        if dtype is not None:
+            df[column] = convert(column, df[column], dtype, validate)
+    return df
+
+
+def typed_frame(rows, columns):
+    # DataFrame from cursor rows with the schema applied
+    return apply_schema(pd.DataFrame(rows, columns=list(columns)))
+
+
+def memory_report(before, after):
+    # {column: (bytes before, bytes after)}, deep, so object strings are counted
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    return {column: (int(before_bytes[column]), int(after_bytes[column])) for column in before.columns}
+
+
+def main():
+    # Imported here, since pulse_data itself applies the schema on load
+    import pulse_data
+
+    parser = argparse.ArgumentParser(description='Report memory before and after the dtype schema')
+    parser.add_argument('--tables', nargs='*', choices=sorted(pulse_data.TABLE_COLUMNS), help='default: all tables')
+    args = parser.parse_args()
+
+    for table in args.tables or pulse_data.TABLE_COLUMNS:
+        raw = pulse_data.read_table(table, pulse_data.TABLE_COLUMNS[table])
+        start = time.perf_counter()
+        typed = apply_schema(raw.copy())
+        seconds = time.perf_counter() - start
+        report = memory_report(raw, typed)
+        before = sum(column_before for column_before, _ in report.values())
+        after = sum(column_after for _, column_after in report.values())
+        print(f"{table}: {len(raw):,} rows, {before / 2 ** 20:.1f} MB -> {after / 2 ** 20:.1f} MB "
+              f"in {seconds:.2f}s")
+        for column, (column_before, column_after) in report.items():
+            print(f"  {column:<20}{str(raw[column].dtype):>12} -> {str(typed[column].dtype):<10}"
+                  f"{column_before / 2 ** 20:>10.2f} MB -> {column_after / 2 ** 20:.2f} MB")
+    if VALIDATE:
+        print("Every conversion was checked to keep its values")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import figure_cache
+import figures
+import insights
+import pulse_cache
+import pulse_data
+from fileio import write_text
+
+# Headless export of the dashboard's rollups and figures.
+#
+# Every (Year, Quarter) is one task in a process pool: the worker writes the
+# quarter's rollups as JSON records and every figure the pages can show for
+# it (state bars and maps, user charts, and the per-state pie and district
+# map) as Plotly JSON, at the path figure_cache.artifact_path() gives its
+# (page, selection). manifest.json is written last and records the data
+# version the export was made from and every file it wrote. The directory
+# can be served as static files, or given to the dashboard as
+# PULSE_ARTIFACT_DIR, which then loads exported figures instead of building
+# them; it only serves files the manifest lists, so a narrower re-export
+# into the same directory never serves figures an earlier run left behind.
+# The Trends figures depend on the states picked on the page and are always
+# built live.
+#
+#   python export.py --out artifacts --workers 4 --years 2022 2023
+
+DEFAULT_OUT_DIR = os.environ.get('PULSE_ARTIFACT_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+DEFAULT_WORKERS = int(os.environ.get('PULSE_EXPORT_WORKERS', os.cpu_count() or 1))
+
+# name -> (table, group columns, measures), summed per (Year, Quarter)
+ROLLUPS = {
+    'state_transactions': ('transaction', ['State'], ['Transaction_count', 'Transaction_amount']),
+    'state_payments': ('transaction', ['State', 'name'], ['Transaction_count', 'Transaction_amount']),
+    'district_transactions': ('map_trans', ['State', 'Districts'], ['Transaction_count', 'Transaction_amount']),
+    'state_users': ('map_user', ['State'], ['RegisteredUser', 'AppOpens']),
+    'district_users': ('map_user', ['State', 'Districts'], ['RegisteredUser', 'AppOpens']),
+    'state_brands': ('agg_user', ['State', 'Brands'], ['Transaction_count']),
+}
+
+
+def rollup_path(root, name, year, quarter):
+    return os.path.join(root, 'rollups', name, f'{year}_{quarter}.json')
+
+
+def quarter_figures(year, quarter, states):
+    # (page, selection, builder) for every figure the pages show for one quarter
+    for measure, label in figures.STATE_MEASURES.items():
+        yield 'state_bar', (year, quarter, measure), lambda m=measure, l=label: figures.build_state_bar(
+            year, quarter, m, l)
+        if figures.has_state_map():
+            yield 'state_map', (year, quarter, measure), lambda m=measure, l=label: figures.build_state_map(
+                year, quarter, m, l)
+    for table, y, title, layout in figures.USER_CHARTS:
+        yield 'user', (year, quarter, y), lambda t=table, y=y, title=title, layout=layout: figures.build_user_bar(
+            t, year, quarter, y, title, **layout)
+    for state in states:
+        if not pulse_data.get_payment_breakdown(state, year, quarter).empty:
+            yield 'pie', (state, year, quarter), lambda s=state: figures.build_pie_chart(s, year, quarter)
+        if figures.has_district_map(state, year, quarter):
+            yield 'district_map', (state, year, quarter), lambda s=state: figures.build_district_map(
+                s, year, quarter)
+
+
+def write_figures(out_dir, jobs):
+    written = {}
+    for page, selection, builder in jobs:
+        path = figure_cache.artifact_path(out_dir, page, selection)
+        figure_json = figure_cache.build_json(page, builder)
+        write_text(path, figure_json)
+        written[os.path.relpath(path, out_dir)] = len(figure_json)
+    return written
+
+
+def export_quarter(out_dir, year, quarter, states):
+    # Entry point of a worker process; returns {relative path: bytes}
+    written = {}
+    filters = pulse_data.slice_filters(year, quarter)
+    for name, (table, group_columns, measures) in ROLLUPS.items():
+        path = rollup_path(out_dir, name, year, quarter)
+        records = pulse_data.fetch_aggregate(table, group_columns, measures, filters).to_json(orient='records')
+        write_text(path, records)
+        written[os.path.relpath(path, out_dir)] = len(records)
+    written.update(write_figures(out_dir, quarter_figures(year, quarter, states)))
+    return written
+
+
+def export_insights(out_dir):
+    return write_figures(out_dir, [('insights', (question,), lambda q=question: insights.build_figure(q))
+                                   for question in insights.INSIGHTS])
+
+
+def export(out_dir, workers=DEFAULT_WORKERS, years=None, quarters=None):
+    start = time.perf_counter()
+    version = pulse_cache.data_version()
+    states = pulse_data.get_keys()[2]
+    periods = [(year, quarter) for year, quarter in pulse_data.get_periods()
+               if (not years or year in years) and (not quarters or quarter in quarters)]
+
+    artifacts = {}
+    # spawn, so each worker opens its own database connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(export_quarter, out_dir, year, quarter, states) for year, quarter in periods]
+        futures.append(pool.submit(export_insights, out_dir))
+        for future in as_completed(futures):
+            artifacts.update(future.result())
+
+    if pulse_cache.data_version() != version:
+        raise RuntimeError("A new data version was published during the export; run it again")
+    manifest = {
+        'data_version': version,
+        'created': time.time(),
+        'seconds': time.perf_counter() - start,
+        'periods': periods,
+        'artifacts': dict(sorted(artifacts.items())),
+    }
+    write_text(os.path.join(out_dir, figure_cache.MANIFEST_NAME), json.dumps(manifest, indent=1))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-render the dashboard rollups and figures')
+    parser.add_argument('--out', default=DEFAULT_OUT_DIR, help='artifact directory')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--years', nargs='*', type=int, help='default: every year')
+    parser.add_argument('--quarters', nargs='*', type=int, help='default: every quarter')
+    args = parser.parse_args()
+
+    manifest = export(args.out, args.workers, args.years, args.quarters)
+    artifacts = manifest['artifacts']
+    print(f"Wrote {len(artifacts):,} artifacts ({sum(artifacts.values()) / 2 ** 20:.1f} MB) for "
+          f"{len(manifest['periods'])} quarters to {args.out} in {manifest['seconds']:.1f}s "
+          f"(data version {manifest['data_version']})")
+
+
+if __name__ == '__main__':
+    main()
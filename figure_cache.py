@@ -0,0 +1,93 @@
+import json
+import os
+import re
+
+import plotly.io as pio
+
+import perf
+from pulse_cache import TTLCache, data_version
+
+# Memoized Plotly figures, shared by every session in the process.
+#
+# Figures are stored as serialized JSON keyed by (page, selection). Each
+# entry also carries the data version it was built from, so publishing a new
+# version makes every cached figure stale; beyond PULSE_FIGURE_CACHE_SIZE
+# entries the least recently viewed figure is evicted. A hit skips both the
+# aggregation and Plotly's figure construction.
+#
+# With PULSE_ARTIFACT_DIR set to the output of export.py, a miss first looks
+# for the exported figure and only builds it when the export's manifest does
+# not list it or was made from another data version. Files a previous export
+# left in the directory are never served.
+
+FIGURES = TTLCache(ttl=int(os.environ.get('PULSE_FIGURE_CACHE_TTL', 3600)),
+                   max_entries=int(os.environ.get('PULSE_FIGURE_CACHE_SIZE', 128)))
+
+ARTIFACT_DIR = os.environ.get('PULSE_ARTIFACT_DIR')
+MANIFEST_NAME = 'manifest.json'
+
+
+def selection_key(page, selection):
+    # numpy scalars from the selectboxes become plain values
+    return (page,) + tuple(value.item() if hasattr(value, 'item') else value for value in selection)
+
+
+def artifact_path(root, page, selection):
+    # figures/<page>/<selection values joined by '_'>.json, safe as a file name and a URL
+    parts = [re.sub(r'[^A-Za-z0-9.-]+', '-', str(value)).strip('-') for value in selection_key(page, selection)[1:]]
+    return os.path.join(root, 'figures', page, '_'.join(parts) + '.json')
+
+
+def read_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def read_artifact(root, page, selection):
+    # Exported figure JSON for the current data version, or None; only the
+    # paths the last export wrote (its manifest's 'artifacts') are served
+    manifest = read_manifest(root)
+    if manifest.get('data_version') != data_version():
+        return None
+    path = artifact_path(root, page, selection)
+    if os.path.relpath(path, root) not in manifest.get('artifacts', {}):
+        return None
+    with perf.span(f'figure.artifact.{page}') as span:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                figure_json = f.read()
+        except FileNotFoundError:
+            return None
+        span['bytes'] = len(figure_json)
+    return figure_json
+
+
+def load_json(page, selection, builder):
+    figure_json = read_artifact(ARTIFACT_DIR, page, selection) if ARTIFACT_DIR else None
+    return figure_json or build_json(page, builder)
+
+
+def build_json(page, builder):
+    # Only runs on a miss: the aggregation and Plotly construction behind the figure
+    with perf.span(f'figure.build.{page}') as span:
+        figure_json = builder().to_json()
+        span['bytes'] = len(figure_json)
+    return figure_json
+
+
+def cached_figure(page, selection, builder):
+    with perf.span(f'figure.{page}') as span:
+        figure_json = FIGURES.get_or_load(selection_key(page, selection), lambda: load_json(page, selection, builder))
+        span['bytes'] = len(figure_json)
+        return pio.from_json(figure_json)
+
+
+def invalidate():
+    FIGURES.invalidate()
+
+
+def stats():
+    return FIGURES.stats()
@@ -0,0 +1,103 @@
+import pandas as pd
+import plotly.express as px
+
+import geo
+import pulse_data
+import trends
+
+# Plotly figure builders for the dashboard pages.
+#
+# Everything here reads through the pulse_data query API and returns a
+# figure, with no Streamlit import, so the page script, the export CLI and
+# any reporting job build the same charts. The (page, selection) a figure is
+# cached and exported under is the one the page script uses.
+
+# measure -> label for the state bar charts and choropleths
+STATE_MEASURES = {
+    'Transaction_amount': 'Transaction Amount',
+    'Transaction_count': 'Transaction Count',
+}
+
+# (table, measure, title, layout) per chart on the Explore User Data page
+USER_CHARTS = [
+    ('agg_user', 'Transaction_count', 'Transaction Count', {'height': 650, 'width': 500}),
+    ('map_user', 'RegisteredUser', 'Registered Users', {}),
+    ('agg_user', 'Brands', 'Brands', {}),
+    ('map_user', 'AppOpens', 'App Opens', {}),
+]
+
+
+def build_pie_chart(selected_state2, year, quarter):
+    state_data = pulse_data.get_payment_breakdown(selected_state2, year, quarter)
+    if state_data.empty:
+        return None
+    # Use unique values of 'name' for the selected state
+    unique_names = state_data['name'].unique()
+    name_counts = pd.DataFrame({'name': unique_names, 'count': [1] * len(unique_names)})
+
+    return px.pie(name_counts, names='name', values='count', title=f'{selected_state2} - Name Distribution')
+
+
+def build_state_bar(year, quarter, measure, label):
+    df_agg3 = pulse_data.get_state_rollup(year, quarter)
+    return px.bar(df_agg3, x='State', y=measure,
+                  title=f'{year} Q{quarter} {label} by State',
+                  labels={'State': 'State', measure: label})
+
+
+def build_state_map(year, quarter, measure, label):
+    # Bundled GeoJSON for states, loaded once per process
+    data_geojson = geo.load_states()
+    df_agg3 = pulse_data.get_state_rollup(year, quarter)
+    df_agg3 = df_agg3.assign(ST_NM=df_agg3['State'].map(geo.state_feature_name))
+
+    fig_map = px.choropleth(df_agg3, geojson=data_geojson,
+                            locations='ST_NM', featureidkey="properties.ST_NM",
+                            color=measure,
+                            color_continuous_scale='Sunsetdark',
+                            range_color=(df_agg3[measure].min(), df_agg3[measure].max()),
+                            hover_name='State',
+                            labels={measure: label})
+    fig_map.update_geos(fitbounds="locations", visible=False)
+    unmapped = geo.unmapped_states(df_agg3['State'])
+    if unmapped:
+        fig_map.add_annotation(text=f"Not on this map: {', '.join(unmapped)}", showarrow=False,
+                               xref='paper', yref='paper', x=0, y=0)
+    return fig_map
+
+
+def has_state_map():
+    # The bundled states GeoJSON is present
+    return geo.load_states() is not None
+
+
+def has_district_map(state, year, quarter):
+    # Only when the district GeoJSON has been built and the state has districts that quarter
+    return (geo.districts_for_state(state) is not None
+            and not pulse_data.get_district_breakdown(state, year, quarter).empty)
+
+
+def build_district_map(state, year, quarter):
+    district_geojson = geo.districts_for_state(state)
+    df_districts = pulse_data.get_district_breakdown(state, year, quarter)
+    df_districts = df_districts.assign(
+        key=[geo.district_key(state, district) for district in df_districts['Districts']])
+
+    fig_district_map = px.choropleth(df_districts, geojson=district_geojson,
+                                     locations='key', featureidkey="properties.key",
+                                     color='Transaction_amount',
+                                     color_continuous_scale='Sunsetdark',
+                                     hover_name='Districts',
+                                     title=f'{state} {year} Q{quarter} Transaction Amount by District',
+                                     labels={'Transaction_amount': 'Transaction Amount'})
+    fig_district_map.update_geos(fitbounds="locations", visible=False)
+    return fig_district_map
+
+
+def build_user_bar(table, year, quarter, y, title, **layout):
+    return px.bar(pulse_data.get_slice(table, year, quarter), x='State', y=y, title=title, **layout)
+
+
+def build_trend_line(matrix, states, title, y_label):
+    df = trends.long_format(matrix[states], 'State', y_label)
+    return px.line(df, x='Period', y=y_label, color='State', title=title, markers=True)
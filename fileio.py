@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# Whole-file writes that readers never see half done.
+#
+# The text goes to a uniquely named temporary file next to the target, which
+# is then renamed over it; os.replace is atomic on POSIX and Windows, so the
+# dashboard, a static server or a Prometheus scrape reads either the old
+# file or the new one, and concurrent writers (two sessions finishing a
+# request at once) never share a temporary file.
+
+
+def write_text(path, text):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,206 @@
+import argparse
+import functools
+import json
+import os
+import re
+import urllib.request
+
+import perf
+from fileio import write_text
+from normalize import canonical_state, match_key
+
+# India state and district boundaries for the choropleths.
+#
+# The GeoJSON is built once into assets/ (simplified, with stripped
+# properties and a State -> ST_NM lookup) and loaded from disk at startup,
+# instead of being downloaded from the gist on every render. The states
+# asset is committed; without it the state choropleths are skipped.
+#
+# The committed states asset was built from the echarts-countries India map
+# (MIT), which predates 2019: Ladakh is drawn inside Jammu & Kashmir and
+# Lakshadweep is absent, so the choropleth names the states it can't draw.
+# `python geo.py` rebuilds it from the gist's current boundaries. No
+# districts asset is committed; district maps appear once one is built.
+#
+#   python geo.py --tolerance 0.01 --districts path/to/india_districts.geojson
+
+STATES_URL = ("https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw"
+              "/e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson")
+
+ASSETS_DIR = os.environ.get('PULSE_ASSETS_DIR',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'))
+STATES_FILE = os.path.join(ASSETS_DIR, 'india_states.geojson')
+DISTRICTS_FILE = os.path.join(ASSETS_DIR, 'india_districts.geojson')
+LOOKUP_FILE = os.path.join(ASSETS_DIR, 'state_lookup.json')
+
+DEFAULT_TOLERANCE = float(os.environ.get('PULSE_GEO_TOLERANCE', 0.01))
+COORDINATE_DIGITS = 4
+
+
+def district_key(state, district):
+    return f'{match_key(state)}|{match_key(district)}'
+
+
+def _perpendicular_distance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / (dx * dx + dy * dy) ** 0.5
+
+
+def simplify_line(points, tolerance):
+    # Douglas-Peucker, iterative so large rings don't hit the recursion limit
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, None
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def simplify_ring(ring, tolerance):
+    simplified = simplify_line(ring, tolerance)
+    # A polygon ring needs at least four points (closed triangle)
+    if len(simplified) < 4:
+        simplified = ring
+    return [[round(x, COORDINATE_DIGITS), round(y, COORDINATE_DIGITS)] for x, y in simplified]
+
+
+def simplify_geometry(geometry, tolerance):
+    if geometry['type'] == 'Polygon':
+        coordinates = [simplify_ring(ring, tolerance) for ring in geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        coordinates = [[simplify_ring(ring, tolerance) for ring in polygon]
+                       for polygon in geometry['coordinates']]
+    else:
+        return geometry
+    return {'type': geometry['type'], 'coordinates': coordinates}
+
+
+def read_geojson(source):
+    with perf.span('geo.download' if re.match(r'https?://', source) else 'geo.read') as span:
+        if re.match(r'https?://', source):
+            with urllib.request.urlopen(source, timeout=30) as response:
+                payload = response.read()
+        else:
+            with open(source, 'rb') as f:
+                payload = f.read()
+        span['bytes'] = len(payload)
+        return json.loads(payload)
+
+
+def write_json(path, payload):
+    write_text(path, json.dumps(payload, separators=(',', ':')))
+
+
+def build_states(source=STATES_URL, tolerance=DEFAULT_TOLERANCE):
+    raw = read_geojson(source)
+    features = []
+    for feature in raw['features']:
+        features.append({
+            'type': 'Feature',
+            'properties': {'ST_NM': feature['properties']['ST_NM']},
+            'geometry': simplify_geometry(feature['geometry'], tolerance),
+        })
+    states = {'type': 'FeatureCollection', 'features': features}
+    write_json(STATES_FILE, states)
+    write_json(LOOKUP_FILE, {match_key(f['properties']['ST_NM']): f['properties']['ST_NM'] for f in features})
+    return states
+
+
+def build_districts(source, tolerance=DEFAULT_TOLERANCE, state_property='ST_NM', district_property='DISTRICT'):
+    raw = read_geojson(source)
+    features = []
+    for feature in raw['features']:
+        properties = feature['properties']
+        state, district = properties[state_property], properties[district_property]
+        features.append({
+            'type': 'Feature',
+            'properties': {'ST_NM': state, 'DT_NM': district, 'key': district_key(state, district)},
+            'geometry': simplify_geometry(feature['geometry'], tolerance),
+        })
+    districts = {'type': 'FeatureCollection', 'features': features}
+    write_json(DISTRICTS_FILE, districts)
+    return districts
+
+
+@functools.lru_cache(maxsize=1)
+def load_states():
+    # Loaded once per process. None when the asset is missing: renders never
+    # download, the choropleths are skipped until `python geo.py` rebuilds it
+    if not os.path.exists(STATES_FILE):
+        return None
+    return read_geojson(STATES_FILE)
+
+
+@functools.lru_cache(maxsize=1)
+def load_state_lookup():
+    if not os.path.exists(LOOKUP_FILE):
+        return {}
+    with open(LOOKUP_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=1)
+def load_districts():
+    if not os.path.exists(DISTRICTS_FILE):
+        return None
+    return read_geojson(DISTRICTS_FILE)
+
+
+@functools.lru_cache(maxsize=64)
+def districts_for_state(state):
+    # Only the selected state's features, to keep the figure payload small
+    districts = load_districts()
+    if districts is None:
+        return None
+    key = match_key(state)
+    features = [f for f in districts['features'] if f['properties']['key'].split('|')[0] == key]
+    if not features:
+        return None
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def state_feature_name(state):
+    state = canonical_state(state)
+    return load_state_lookup().get(match_key(state), state)
+
+
+def unmapped_states(states):
+    # States the bundled asset has no feature for, so the choropleth can't draw them
+    lookup = load_state_lookup()
+    return sorted({state for state in map(canonical_state, states) if match_key(state) not in lookup})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the bundled India GeoJSON assets')
+    parser.add_argument('--states', default=STATES_URL, help='states GeoJSON file or URL')
+    parser.add_argument('--districts', help='districts GeoJSON file or URL')
+    parser.add_argument('--state-property', default='ST_NM')
+    parser.add_argument('--district-property', default='DISTRICT')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='simplification tolerance in degrees')
+    args = parser.parse_args()
+
+    states = build_states(args.states, args.tolerance)
+    print(f"Wrote {len(states['features'])} states to {STATES_FILE} ({os.path.getsize(STATES_FILE):,} bytes)")
+    if args.districts:
+        districts = build_districts(args.districts, args.tolerance, args.state_property, args.district_property)
+        print(f"Wrote {len(districts['features'])} districts to {DISTRICTS_FILE} "
+              f"({os.path.getsize(DISTRICTS_FILE):,} bytes)")
+
+
+if __name__ == '__main__':
+    main()
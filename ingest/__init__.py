@@ -0,0 +1,2 @@
+from ingest.specs import DATASETS, DatasetSpec
+from ingest.pipeline import run, save_manifest, stream
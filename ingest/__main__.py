@@ -0,0 +1,101 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import db
+import pulse_cache
+import schema
+import snapshot
+from ingest import load, pipeline
+from ingest.specs import DATASETS
+
+#   python -m ingest --data-root C:/path/to/pulse-master/data
+
+MANIFEST_NAME = 'ingest_manifest.json'
+
+
+def default_manifest(args):
+    # One manifest per destination, so files already loaded into one are not
+    # skipped when loading another
+    if args.parquet:
+        return os.path.join(args.parquet, MANIFEST_NAME)
+    if args.sqlite:
+        return f'{args.sqlite}.{MANIFEST_NAME}'
+    return f'{args.host}_{args.database}.{MANIFEST_NAME}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load the pulse-master JSON tree into MySQL')
+    parser.add_argument('--data-root', required=True, help='path to pulse-master/data')
+    parser.add_argument('--datasets', nargs='*', choices=sorted(DATASETS), help='default: all datasets')
+    parser.add_argument('--manifest', help='default: one per destination, next to a Parquet or SQLite output')
+    parser.add_argument('--workers', type=int, help='parser processes, default: one per core')
+    parser.add_argument('--full', action='store_true', help='ignore the manifest and parse every file')
+    parser.add_argument('--mode', choices=load.MODES, default='executemany')
+    parser.add_argument('--chunk-size', type=int, default=load.DEFAULT_CHUNK_SIZE, help='rows per INSERT batch')
+    parser.add_argument('--flush-rows', type=int, default=pipeline.CHUNK_ROWS,
+                        help='parsed rows buffered per dataset before they are written')
+    parser.add_argument('--parquet', help='write the parsed rows to this Parquet directory instead of a database')
+    parser.add_argument('--sqlite', help='load into this SQLite file instead of MySQL')
+    parser.add_argument('--snapshot', action='store_true', help='re-export the Parquet snapshot after loading')
+    parser.add_argument('--host', default=db.CONFIG['host'])
+    parser.add_argument('--user', default=db.CONFIG['user'])
+    parser.add_argument('--password', default=db.CONFIG['password'])
+    parser.add_argument('--database', default=db.CONFIG['database'])
+    args = parser.parse_args()
+    manifest_path = args.manifest or default_manifest(args)
+
+    def open_connection():
+        if args.sqlite:
+            return sqlite3.connect(args.sqlite)
+        return db.connect(
+            host=args.host,
+            user=args.user,
+            password=args.password,
+            database=args.database,
+            allow_local_infile=args.mode == 'infile'
+        )
+
+    # The connection is opened with the first chunk; chunks are written while parsing continues
+    conn = None
+    sink = None
+    written = {}
+
+    def write_chunk(name, df):
+        nonlocal conn, sink
+        if sink is None:
+            if args.parquet:
+                sink = load.parquet_writer(args.parquet)
+            else:
+                conn = open_connection()
+                sink = load.frame_writer(conn, args.mode, args.chunk_size)
+        stats = sink(name, df)
+        rows, seconds = written.get(stats.table, (0, 0.0))
+        written[stats.table] = (rows + stats.rows, seconds + stats.seconds)
+
+    start = time.perf_counter()
+    result = pipeline.stream(args.data_root, write_chunk, args.datasets, manifest_path, args.workers, args.full,
+                             args.flush_rows)
+    print(f"Parsed {sum(len(q) for q in result.quarters.values())} files, "
+          f"{result.skipped} unchanged, in {time.perf_counter() - start:.1f}s")
+    for table, (rows, seconds) in written.items():
+        print(f"{table}: {rows} rows written in {seconds:.2f}s ({rows / seconds if seconds else 0.0:,.0f} rows/s)")
+
+    if conn is not None:
+        # Keys, indexes and the Insights summary tables follow every load
+        schema.migrate(conn)
+        periods = None if args.full else {(year, quarter) for touched in result.quarters.values()
+                                          for _, year, quarter in touched}
+        schema.refresh_summaries(conn, periods)
+        if args.snapshot:
+            snapshot.export(conn=conn)
+        conn.close()
+
+    pipeline.save_manifest(result.manifest, manifest_path)
+    if conn is not None:
+        pulse_cache.publish_data_version()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from dtypes import SCHEMA
+from normalize import STATES, canonical_district, canonical_state
+
+# Typed, append-only column buffers for the ingestion pipeline.
+#
+# Parsed values go straight into array.array columns of the dtypes.SCHEMA
+# types (int16 Year, int8 Quarter, int64 counts, float64 amounts) instead of
+# per-row tuples, and the string dimensions are dictionary-encoded as int32
+# codes as they arrive, so each distinct name is stored and canonicalized once. take_frame() hands
+# the first rows to pandas as NumPy views and categoricals and drops them
+# from the buffer, which is how the pipeline flushes fixed-size chunks.
+
+# array.array typecodes for the numeric dtypes declared in dtypes.SCHEMA
+ARRAY_TYPECODES = {'int8': 'b', 'int16': 'h', 'int64': 'q', 'float64': 'd'}
+TYPECODES = dict({column: ARRAY_TYPECODES[dtype] for column, dtype in SCHEMA.items() if dtype in ARRAY_TYPECODES},
+                 Response_Timestamp='q')
+CODE_TYPECODE = 'i'
+
+# Canonical spelling and initial categories for the dimension columns;
+# anything else is stored as given
+CANONICAL = {
+    'State': (canonical_state, STATES),
+    'Districts': (canonical_district, []),
+    'Entityname': (canonical_district, []),
+}
+
+
+class Dictionary:
+    # raw value -> code of its canonical name; codes never change once given
+    def __init__(self, canonical=None, categories=()):
+        self.canonical = canonical
+        self.values = list(categories)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self.raw_codes = {}
+
+    def code(self, raw):
+        code = self.raw_codes.get(raw)
+        if code is None:
+            value = self.canonical(raw) if self.canonical else raw
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            self.raw_codes[raw] = code
+        return code
+
+    def remap(self, other):
+        # Codes of this dictionary for every code of another one
+        mapping = np.empty(len(other.values), dtype=np.int32)
+        for code, value in enumerate(other.values):
+            target = self.codes.get(value)
+            if target is None:
+                target = self.codes[value] = len(self.values)
+                self.values.append(value)
+            mapping[code] = target
+        return mapping
+
+
+class TableBuffer:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.dictionaries = {}
+        for column in self.columns:
+            if column not in TYPECODES:
+                canonical, categories = CANONICAL.get(column, (None, []))
+                self.dictionaries[column] = Dictionary(canonical, categories)
+        self.data = [array(TYPECODES.get(column, CODE_TYPECODE)) for column in self.columns]
+
+    def __len__(self):
+        return len(self.data[0])
+
+    def append(self, row):
+        for column, values, value in zip(self.columns, self.data, row):
+            dictionary = self.dictionaries.get(column)
+            values.append(dictionary.code(value) if dictionary else value)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def merge(self, other):
+        # Appends another buffer's rows (e.g. from a parser process), re-coding its dimensions
+        for column, values, other_values in zip(self.columns, self.data, other.data):
+            dictionary = self.dictionaries.get(column)
+            if dictionary is None:
+                values.extend(other_values)
+            elif len(other_values):
+                mapping = dictionary.remap(other.dictionaries[column])
+                codes = np.frombuffer(other_values, dtype=np.int32)
+                values.frombytes(mapping[codes].tobytes())
+
+    def take_frame(self, limit=None):
+        # DataFrame of the first `limit` rows (all rows by default), removed from the buffer
+        rows = len(self) if limit is None else min(limit, len(self))
+        frame = {}
+        for column, values in zip(self.columns, self.data):
+            head = np.frombuffer(values, dtype=values.typecode)[:rows].copy()
+            if column in self.dictionaries:
+                frame[column] = pd.Categorical.from_codes(head, categories=list(self.dictionaries[column].values))
+            else:
+                frame[column] = head
+            del values[:rows]
+        return pd.DataFrame(frame, columns=self.columns)
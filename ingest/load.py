@@ -0,0 +1,264 @@
+import csv
+import itertools
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from collections import namedtuple
+
+import pandas as pd
+
+from ingest.specs import DATASETS
+
+# Bulk loading of ingested frames into MySQL, or SQLite as a local stand-in.
+#
+# Rows are written in chunks, either with executemany, with explicit
+# multi-row VALUES statements, or (MySQL only) with LOAD DATA LOCAL INFILE
+# fed from a streamed CSV file. Every mode is an upsert keyed on
+# (State, Year, Quarter, dimension), so reloading a quarter does not
+# duplicate its rows; tables created by the notebook get that unique key
+# (after their duplicate rows are removed) before the first write. The
+# stored rows of every (State, Year, Quarter) a load touches are deleted
+# once, in the same transaction as its first chunk, so a district or brand
+# that a reloaded quarter no longer contains does not linger.
+# write_parquet() is the no-database sink: each chunk becomes new part files
+# of a Year/Quarter partitioned dataset, after the partitions it touches
+# are rewritten without the rows of its (State, Year, Quarter) keys.
+
+MODES = ('executemany', 'multirow', 'infile')
+PARTITION_COLUMNS = ['Year', 'Quarter']
+PERIOD_KEY = ['State', 'Year', 'Quarter']
+DEFAULT_CHUNK_SIZE = int(os.environ.get('PULSE_LOAD_CHUNK_SIZE', 5000))
+
+COLUMN_TYPES = {
+    'Transaction_count': 'BIGINT',
+    'Transaction_amount': 'DOUBLE',
+    'Percentage': 'DOUBLE',
+    'RegisteredUser': 'BIGINT',
+    'AppOpens': 'BIGINT',
+}
+
+LoadStats = namedtuple('LoadStats', ['table', 'rows', 'seconds', 'rows_per_second'])
+
+
+def is_sqlite(conn):
+    return isinstance(conn, sqlite3.Connection)
+
+
+def placeholder(conn):
+    return '?' if is_sqlite(conn) else '%s'
+
+
+def quoted_table(name):
+    # Backticks work in both MySQL and SQLite; `transaction` is reserved in SQLite
+    return f"`{DATASETS[name].table}`"
+
+
+def key_columns(name):
+    spec = DATASETS[name]
+    return ['State', 'Year', 'Quarter'] + ([spec.key] if spec.key else [])
+
+
+def create_table(cursor, name):
+    spec = DATASETS[name]
+    columns = ['State VARCHAR(64)', 'Year SMALLINT', 'Quarter TINYINT']
+    columns += [f"{column} {COLUMN_TYPES.get(column, 'VARCHAR(100)')}" for column in spec.columns]
+    columns.append('Response_Timestamp VARCHAR(255)')
+    columns.append(f"UNIQUE ({', '.join(key_columns(name))})")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {quoted_table(name)} ({', '.join(columns)})")
+
+
+def unique_key_name(name):
+    return f"ux_{DATASETS[name].table}_key"
+
+
+def has_unique_key(cursor, conn, name):
+    table, keys = DATASETS[name].table, key_columns(name)
+    if is_sqlite(conn):
+        cursor.execute(f"PRAGMA index_list(`{table}`)")
+        for index in [row[1] for row in cursor.fetchall() if row[2]]:
+            cursor.execute(f"PRAGMA index_info(`{index}`)")
+            if [row[2] for row in sorted(cursor.fetchall())] == keys:
+                return True
+        return False
+    cursor.execute("""SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+                      ORDER BY INDEX_NAME, SEQ_IN_INDEX""", (table,))
+    indexes = {}
+    for index, column in cursor.fetchall():
+        indexes.setdefault(index, []).append(column)
+    return keys in indexes.values()
+
+
+def add_unique_key(cursor, conn, name):
+    # Existing duplicates would block the index; the latest row of each key is kept
+    if has_unique_key(cursor, conn, name):
+        return
+    table, keys = DATASETS[name].table, ', '.join(key_columns(name))
+    if is_sqlite(conn):
+        cursor.execute(f"""DELETE FROM `{table}` WHERE rowid NOT IN
+                           (SELECT MAX(rowid) FROM `{table}` GROUP BY {keys})""")
+        cursor.execute(f"CREATE UNIQUE INDEX {unique_key_name(name)} ON `{table}` ({keys})")
+        return
+    # MySQL tables from the notebook have no row id, so the rows are copied into
+    # a keyed twin, newest Response_Timestamp first, and the twin replaces the table
+    cursor.execute(f"DROP TABLE IF EXISTS `{table}__keyed`")
+    cursor.execute(f"CREATE TABLE `{table}__keyed` LIKE `{table}`")
+    cursor.execute(f"ALTER TABLE `{table}__keyed` ADD UNIQUE KEY {unique_key_name(name)} ({keys})")
+    cursor.execute(f"INSERT IGNORE INTO `{table}__keyed` SELECT * FROM `{table}` ORDER BY Response_Timestamp DESC")
+    cursor.execute(f"RENAME TABLE `{table}` TO `{table}__unkeyed`, `{table}__keyed` TO `{table}`")
+    cursor.execute(f"DROP TABLE `{table}__unkeyed`")
+
+
+def delete_keys(conn, cursor, name, keys):
+    mark = placeholder(conn)
+    cursor.executemany(f"DELETE FROM {quoted_table(name)} WHERE State = {mark} AND Year = {mark} AND Quarter = {mark}",
+                       sorted(keys))
+
+
+def upsert_clause(conn, name, columns):
+    keys = key_columns(name)
+    updates = [column for column in columns if column not in keys]
+    if is_sqlite(conn):
+        assignments = ', '.join(f'{column} = excluded.{column}' for column in updates)
+        return f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {assignments}"
+    assignments = ', '.join(f'{column} = VALUES({column})' for column in updates)
+    return f" ON DUPLICATE KEY UPDATE {assignments}"
+
+
+def chunks(df, chunk_size):
+    # itertuples yields native Python scalars, which both drivers can bind
+    rows = df.itertuples(index=False, name=None)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_executemany(conn, cursor, name, df, chunk_size):
+    columns = list(df.columns)
+    values = ', '.join([placeholder(conn)] * len(columns))
+    sql = (f"INSERT INTO {quoted_table(name)} ({', '.join(columns)}) VALUES ({values})"
+           + upsert_clause(conn, name, columns))
+    for chunk in chunks(df, chunk_size):
+        cursor.executemany(sql, chunk)
+
+
+def load_multirow(conn, cursor, name, df, chunk_size):
+    columns = list(df.columns)
+    row_values = '(' + ', '.join([placeholder(conn)] * len(columns)) + ')'
+    prefix = f"INSERT INTO {quoted_table(name)} ({', '.join(columns)}) VALUES "
+    suffix = upsert_clause(conn, name, columns)
+    for chunk in chunks(df, chunk_size):
+        sql = prefix + ', '.join([row_values] * len(chunk)) + suffix
+        cursor.execute(sql, [value for row in chunk for value in row])
+
+
+def load_infile(conn, cursor, name, df, chunk_size):
+    # The CSV is written chunk by chunk, so the frame is never rendered to one string
+    if is_sqlite(conn):
+        raise ValueError("LOAD DATA LOCAL INFILE needs MySQL; use 'executemany' or 'multirow' with SQLite")
+    columns = list(df.columns)
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        for chunk in chunks(df, chunk_size):
+            writer.writerows(chunk)
+        csv_path = f.name
+    try:
+        cursor.execute(f"""LOAD DATA LOCAL INFILE '{csv_path.replace(os.sep, '/')}'
+                           REPLACE INTO TABLE {quoted_table(name)}
+                           CHARACTER SET utf8mb4
+                           FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                           LINES TERMINATED BY '\\n'
+                           ({', '.join(columns)})""")
+    finally:
+        os.remove(csv_path)
+
+
+LOADERS = {
+    'executemany': load_executemany,
+    'multirow': load_multirow,
+    'infile': load_infile,
+}
+
+
+def clear_parquet_keys(out_dir, name, keys):
+    # Rewrites each Year/Quarter partition the keys fall in without those
+    # states' rows; the other states of the partition are kept as they are
+    states = {}
+    for state, year, quarter in keys:
+        states.setdefault((year, quarter), set()).add(state)
+    for (year, quarter), replaced in states.items():
+        partition = os.path.join(out_dir, DATASETS[name].table, f'Year={year}', f'Quarter={quarter}')
+        if not os.path.isdir(partition):
+            continue
+        existing = pd.read_parquet(partition)
+        kept = existing[~existing['State'].isin(replaced)]
+        shutil.rmtree(partition)
+        if len(kept):
+            os.makedirs(partition)
+            kept.to_parquet(os.path.join(partition, f'{uuid.uuid4().hex}-0.parquet'), index=False)
+
+
+def write_parquet(out_dir, name, df, cleared=None):
+    # cleared works as in write_frame: keys not in it are replaced, not appended to
+    start = time.perf_counter()
+    keys = frame_keys(df) - (cleared or set())
+    clear_parquet_keys(out_dir, name, keys)
+    # Plain strings, so every part file has the same schema whatever its categories
+    df = df.astype({column: object for column in df.select_dtypes('category').columns})
+    df.to_parquet(os.path.join(out_dir, DATASETS[name].table), partition_cols=PARTITION_COLUMNS, index=False)
+    if cleared is not None:
+        cleared.update(keys)
+    seconds = time.perf_counter() - start
+    return LoadStats(DATASETS[name].table, len(df), seconds, len(df) / seconds if seconds else 0.0)
+
+
+def parquet_writer(out_dir):
+    # write_parquet as a pipeline sink, see frame_writer
+    cleared = {}
+
+    def write(name, df):
+        return write_parquet(out_dir, name, df, cleared.setdefault(name, set()))
+    return write
+
+
+def frame_keys(df):
+    # Distinct (State, Year, Quarter) of a frame, as native values
+    return set(df[PERIOD_KEY].drop_duplicates().astype(object).itertuples(index=False, name=None))
+
+
+def write_frame(conn, name, df, mode='executemany', chunk_size=DEFAULT_CHUNK_SIZE, cleared=None):
+    # cleared is the set of (State, Year, Quarter) already replaced during this
+    # load; the frame's other keys have their stored rows deleted first
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    keys = frame_keys(df) - (cleared or set())
+    try:
+        create_table(cursor, name)
+        add_unique_key(cursor, conn, name)
+        delete_keys(conn, cursor, name, keys)
+        LOADERS[mode](conn, cursor, name, df, chunk_size)
+        conn.commit()
+        if cleared is not None:
+            cleared.update(keys)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    seconds = time.perf_counter() - start
+    return LoadStats(DATASETS[name].table, len(df), seconds, len(df) / seconds if seconds else 0.0)
+
+
+def frame_writer(conn, mode='executemany', chunk_size=DEFAULT_CHUNK_SIZE):
+    # write_frame as a pipeline sink: a key is replaced by its first chunk and
+    # appended to by the chunks after it, so a quarter split across chunks survives
+    cleared = {}
+
+    def write(name, df):
+        return write_frame(conn, name, df, mode, chunk_size, cleared.setdefault(name, set()))
+    return write
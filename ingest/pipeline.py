@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+from fileio import write_text
+from ingest.columns import TableBuffer
+from ingest.specs import DATASETS
+from normalize import canonical_state
+
+# Walks the pulse-master data/ tree and parses the quarter files of every
+# requested dataset across a process pool. Records go straight from the
+# parsed document into typed column buffers (ingest.columns), which are
+# flushed to a sink in fixed-size chunks, or returned as one DataFrame per
+# dataset by run(). A manifest of (mtime, size, sha1) per file lets a rerun
+# parse only the quarters that are new or changed.
+
+FileTask = namedtuple('FileTask', ['dataset', 'path', 'state', 'year', 'quarter'])
+IngestResult = namedtuple('IngestResult', ['frames', 'quarters', 'manifest', 'skipped'])
+StreamResult = namedtuple('StreamResult', ['rows', 'quarters', 'manifest', 'skipped'])
+
+CHUNK_ROWS = int(os.environ.get('PULSE_INGEST_CHUNK_ROWS', 50000))
+# Files per parser task
+BATCH_FILES = 64
+
+
+def discover(data_root, dataset_names):
+    tasks = []
+    for name in dataset_names:
+        root = os.path.join(data_root, DATASETS[name].path)
+        if not os.path.isdir(root):
+            print(f"Missing dataset directory: {root}")
+            continue
+        for state in sorted(os.listdir(root)):
+            state_path = os.path.join(root, state)
+            for year in sorted(os.listdir(state_path)):
+                year_path = os.path.join(state_path, year)
+                for quarter_file in sorted(os.listdir(year_path)):
+                    if not quarter_file.endswith('.json'):
+                        continue
+                    tasks.append(FileTask(name, os.path.join(year_path, quarter_file),
+                                          state, int(year), int(quarter_file[:-len('.json')])))
+    return tasks
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    if manifest_path is None or not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_path):
+    write_text(manifest_path, json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def select_changed(tasks, manifest):
+    # mtime and size are checked first; the hash is only computed when they
+    # differ, so a touched-but-identical file is not parsed again
+    changed, updates = [], {}
+    for task in tasks:
+        stat = os.stat(task.path)
+        entry = manifest.get(task.path)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            updates[task.path] = entry
+            continue
+        digest = file_hash(task.path)
+        updates[task.path] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'sha1': digest}
+        if entry is None or entry['sha1'] != digest:
+            changed.append(task)
+    return changed, updates
+
+
+def read_document(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def parse_file(task, buffer):
+    # Appends the file's records to the dataset's buffer; False if the file was skipped
+    document = read_document(task.path)
+    response_timestamp = document.get('responseTimestamp')
+    if response_timestamp is None:
+        print(f"Missing responseTimestamp in file: {task.path}")
+        return False
+    # The raw slug is canonicalized once by the buffer's State dictionary
+    prefix = (task.state, task.year, task.quarter)
+    suffix = (response_timestamp,)
+    for values in DATASETS[task.dataset].extractor(document['data']):
+        buffer.append(prefix + tuple(values) + suffix)
+    return True
+
+
+def parse_batch(tasks):
+    # Runs in a parser process; typed buffers pickle far smaller than row tuples
+    buffers = {}
+    for task in tasks:
+        if task.dataset not in buffers:
+            buffers[task.dataset] = TableBuffer(frame_columns(task.dataset))
+        parse_file(task, buffers[task.dataset])
+    return tasks, buffers
+
+
+def parse_batches(tasks, workers=None):
+    # Yields (tasks, buffers) per batch of files, in order. At most two batches
+    # per worker are in flight, so parsed rows never pile up ahead of the writer.
+    workers = workers or os.cpu_count()
+    batch_files = max(1, min(BATCH_FILES, len(tasks) // (workers * 4)))
+    batches = [tasks[i:i + batch_files] for i in range(0, len(tasks), batch_files)]
+    if workers == 1 or len(batches) < 2:
+        for batch in batches:
+            yield parse_batch(batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(parse_batch, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def frame_columns(name):
+    return ['State', 'Year', 'Quarter'] + DATASETS[name].columns + ['Response_Timestamp']
+
+
+def stream(data_root, sink, dataset_names=None, manifest_path=None, workers=None, full=False,
+           chunk_size=CHUNK_ROWS):
+    # Calls sink(name, df) with chunks of chunk_size rows (the remainder last)
+    # as parsing goes, so memory is bounded by the chunk size rather than by
+    # the number of quarters; chunk_size=None hands over each dataset in one piece.
+    dataset_names = list(dataset_names or DATASETS)
+    tasks = discover(data_root, dataset_names)
+    manifest = load_manifest(manifest_path)
+    changed, updates = select_changed(tasks, {} if full else manifest)
+    new_manifest = dict(manifest, **updates)
+
+    buffers = {name: TableBuffer(frame_columns(name)) for name in dataset_names}
+    rows = {name: 0 for name in dataset_names}
+    quarters = {name: set() for name in dataset_names}
+
+    def flush(name, limit=None):
+        df = buffers[name].take_frame(limit)
+        rows[name] += len(df)
+        sink(name, df)
+
+    for batch, parsed in parse_batches(changed, workers):
+        for task in batch:
+            quarters[task.dataset].add((canonical_state(task.state), task.year, task.quarter))
+        for name, buffer in parsed.items():
+            buffers[name].merge(buffer)
+            while chunk_size and len(buffers[name]) >= chunk_size:
+                flush(name, chunk_size)
+    for name in dataset_names:
+        if len(buffers[name]):
+            flush(name)
+    return StreamResult(rows, quarters, new_manifest, len(tasks) - len(changed))
+
+
+def run(data_root, dataset_names=None, manifest_path=None, workers=None, full=False):
+    # The whole parse as one frame per dataset, for callers that want frames in memory
+    frames = {}
+    result = stream(data_root, frames.__setitem__, dataset_names, manifest_path, workers, full, chunk_size=None)
+    for name, touched in result.quarters.items():
+        if touched and name not in frames:
+            frames[name] = TableBuffer(frame_columns(name)).take_frame()
+    return IngestResult(frames, result.quarters, result.manifest, result.skipped)
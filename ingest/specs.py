@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+# One declarative spec per pulse-master dataset: where its files live under
+# data/, which table it loads into, its value columns, and the extractor that
+# turns one parsed quarter file into rows for those columns.
+#
+# Every row is prefixed with (State, Year, Quarter) by the pipeline and
+# suffixed with the file's Response_Timestamp.
+
+DatasetSpec = namedtuple('DatasetSpec', ['name', 'table', 'path', 'columns', 'key', 'extractor'])
+
+
+def extract_aggregated_insurance(data):
+    return [(z['paymentInstruments'][0]['count'], z['paymentInstruments'][0]['amount'])
+            for z in data['transactionData']]
+
+
+def extract_aggregated_transaction(data):
+    return [(z['name'], z['paymentInstruments'][0]['count'], z['paymentInstruments'][0]['amount'])
+            for z in data['transactionData']]
+
+
+def extract_aggregated_user(data):
+    # usersByDevice is null for quarters without device data
+    return [(i['brand'], i['count'], i['percentage']) for i in data.get('usersByDevice') or []]
+
+
+def extract_map_hover(data):
+    return [(entry['name'], entry['metric'][0]['count'], entry['metric'][0]['amount'])
+            for entry in data['hoverDataList']]
+
+
+def extract_map_user(data):
+    return [(district, v['registeredUsers'], v['appOpens']) for district, v in data['hoverData'].items()]
+
+
+def extract_top_pincodes(data):
+    return [(entry['entityName'], entry['metric']['count'], entry['metric']['amount'])
+            for entry in data['pincodes']]
+
+
+def extract_top_districts(data):
+    return [(entry['entityName'], entry['metric']['count'], entry['metric']['amount'])
+            for entry in data['districts']]
+
+
+def extract_top_user(data):
+    return [(entry['name'], entry['registeredUsers']) for entry in data['districts']]
+
+
+DATASETS = {spec.name: spec for spec in [
+    DatasetSpec('insurance', 'insurance', 'aggregated/insurance/country/india/state',
+                ['Transaction_count', 'Transaction_amount'], None,
+                extract_aggregated_insurance),
+    DatasetSpec('transaction', 'transaction', 'aggregated/transaction/country/india/state',
+                ['name', 'Transaction_count', 'Transaction_amount'], 'name',
+                extract_aggregated_transaction),
+    DatasetSpec('agg_user', 'agg_user', 'aggregated/user/country/india/state',
+                ['Brands', 'Transaction_count', 'Percentage'], 'Brands',
+                extract_aggregated_user),
+    DatasetSpec('map_insurance', 'map_insurance', 'map/insurance/hover/country/india/state',
+                ['Districts', 'Transaction_count', 'Transaction_amount'], 'Districts',
+                extract_map_hover),
+    DatasetSpec('map_trans', 'map_trans', 'map/transaction/hover/country/india/state',
+                ['Districts', 'Transaction_count', 'Transaction_amount'], 'Districts',
+                extract_map_hover),
+    DatasetSpec('map_user', 'map_user', 'map/user/hover/country/india/state',
+                ['Districts', 'RegisteredUser', 'AppOpens'], 'Districts',
+                extract_map_user),
+    DatasetSpec('top_insurance', 'top_insurance', 'top/insurance/country/india/state',
+                ['Pincodes', 'Transaction_count', 'Transaction_amount'], 'Pincodes',
+                extract_top_pincodes),
+    DatasetSpec('top_transaction', 'top_transaction', 'top/transaction/country/india/state',
+                ['Entityname', 'Transaction_count', 'Transaction_amount'], 'Entityname',
+                extract_top_districts),
+    DatasetSpec('top_user', 'top_user', 'top/user/country/india/state',
+                ['Districts', 'RegisteredUser'], 'Districts',
+                extract_top_user),
+]}
@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+import plotly.express as px
+
+import cube
+
+# The Insights questions, declared as cube queries plus a bar chart.
+#
+# query is a cube.Query; columns renames the result columns (dimensions
+# first, then the measure) to the names the chart uses; chart holds the
+# px.bar arguments. A new question is one more entry here.
+
+Insight = namedtuple('Insight', ['query', 'columns', 'chart'])
+
+DARKMINT = px.colors.sequential.Darkmint
+
+INSIGHTS = {
+    "1. Sum of Transaction Count in the Aggregated Insurance by State wise": Insight(
+        cube.Query('Transaction_count', ['State', 'Quarter'], {'source': 'insurance'}),
+        ["states", "quarter", "transaction_count"],
+        dict(x='states', y='transaction_count', title='TRANSACTION COUNT', hover_name='states',
+             color_discrete_sequence=DARKMINT, height=650, width=600)),
+    "2. Top Brands in the Aggregated User by State wise": Insight(
+        cube.Query('Transaction_count', ['State', 'Brand']),
+        ["state", "brand", "total_transaction_count"],
+        dict(x='state', y='brand', title='Top 10 Brands by Total Transaction Count', hover_name='state',
+             color='state', color_discrete_sequence=DARKMINT, height=650, width=600)),
+    "3. Top 10 Transaction amount by Districts in Map Insurance": Insight(
+        cube.Query('Transaction_amount', ['State', 'District'], {'source': 'map_trans'}, limit=10),
+        ["state", "districts", "total_transaction_amount"],
+        dict(x='districts', y='total_transaction_amount', title='Total Transaction Amount by Districts',
+             hover_name='state', color='state', color_discrete_sequence=["rgb(0, 123, 255)"],
+             height=650, width=600)),
+    "4. Highest AppOpens in map_user": Insight(
+        cube.Query('AppOpens', ['State', 'Quarter'], {'source': 'map_user'}),
+        ["state", "quarter", "appopens"],
+        dict(x='state', y='appopens', title='Highest AppOpens', hover_name='state', color='state',
+             color_discrete_sequence=DARKMINT, height=650, width=600)),
+    "5. Highest Registered User in map_user": Insight(
+        cube.Query('RegisteredUser', ['State', 'Quarter'], {'source': 'map_user'}),
+        ["state", "quarter", "registered_user"],
+        dict(x='state', y='registered_user', title='Highest Registered User', hover_name='state', color='state',
+             color_discrete_sequence=DARKMINT, height=650, width=600)),
+    "6. Highest Registered User in Top User": Insight(
+        cube.Query('RegisteredUser', ['State', 'Quarter'], {'source': 'top_user'}),
+        ["state", "quarter", "registered_user"],
+        dict(x='state', y='registered_user', title='Highest Registered User', hover_name='state', color='state',
+             color_discrete_sequence=DARKMINT, height=650, width=600)),
+    "7. Top States by Transaction Count in Insurance": Insight(
+        cube.Query('Transaction_count', ['State', 'Quarter'], {'source': 'top_insurance'}),
+        ["state", "quarter", "transaction count"],
+        dict(x='state', y='transaction count', title='Top Transaction count', hover_name='state', color='state',
+             color_discrete_sequence=DARKMINT, height=650, width=600)),
+    "8. Highest transaction amount in the Map Transactions dataset.": Insight(
+        cube.Query('Transaction_amount', ['State', 'Quarter'], {'source': 'map_trans'}),
+        ["state", "quarter", "transaction amount"],
+        dict(x='state', y='transaction amount', title='Top Transaction amount', hover_name='state', color='state',
+             color_discrete_sequence=px.colors.carto.Darkmint, height=650, width=600)),
+    "9. Transaction Amount by Payment Method and State": Insight(
+        cube.Query('Transaction_amount', ['State', 'Payment'], order='dimensions'),
+        ["state", "payment", "transaction_amount"],
+        dict(x='state', y='transaction_amount', color='payment',
+             title='Transaction Amount by Payment Method and State', hover_name='state', barmode='group',
+             color_discrete_sequence=DARKMINT, height=650, width=800)),
+    "10. Transaction Count by Payment Method and State": Insight(
+        cube.Query('Transaction_count', ['State', 'Payment'], order='dimensions'),
+        ["state", "payment", "transaction_count"],
+        dict(x='state', y='transaction_count', color='payment',
+             title='Transaction Count by Payment Method and State', hover_name='state', barmode='group',
+             color_discrete_sequence=DARKMINT, height=650, width=500)),
+}
+
+
+def insight_frame(question):
+    # set_axis copies, so the memoized cube result is left as it is
+    insight = INSIGHTS[question]
+    return cube.query(insight.query).set_axis(insight.columns, axis=1)
+
+
+def build_figure(question):
+    return px.bar(insight_frame(question), **INSIGHTS[question].chart)
@@ -0,0 +1,118 @@
+import functools
+import re
+
+import pandas as pd
+
+# Canonical state and district names, shared by ingestion and the dashboard.
+#
+# The pulse-master directory slugs map to one canonical spelling per state
+# (the same spelling as ST_NM in the India GeoJSON) and a fixed integer id.
+# Columns are normalized by factorizing them first and mapping only the
+# distinct values, so cleaning costs O(distinct values) instead of a chain of
+# str.replace passes over every row.
+
+STATE_SLUGS = {
+    'andaman-&-nicobar-islands': 'Andaman & Nicobar',
+    'andhra-pradesh': 'Andhra Pradesh',
+    'arunachal-pradesh': 'Arunachal Pradesh',
+    'assam': 'Assam',
+    'bihar': 'Bihar',
+    'chandigarh': 'Chandigarh',
+    'chhattisgarh': 'Chhattisgarh',
+    'dadra-&-nagar-haveli-&-daman-&-diu': 'Dadra and Nagar Haveli and Daman and Diu',
+    'delhi': 'Delhi',
+    'goa': 'Goa',
+    'gujarat': 'Gujarat',
+    'haryana': 'Haryana',
+    'himachal-pradesh': 'Himachal Pradesh',
+    'jammu-&-kashmir': 'Jammu & Kashmir',
+    'jharkhand': 'Jharkhand',
+    'karnataka': 'Karnataka',
+    'kerala': 'Kerala',
+    'ladakh': 'Ladakh',
+    'lakshadweep': 'Lakshadweep',
+    'madhya-pradesh': 'Madhya Pradesh',
+    'maharashtra': 'Maharashtra',
+    'manipur': 'Manipur',
+    'meghalaya': 'Meghalaya',
+    'mizoram': 'Mizoram',
+    'nagaland': 'Nagaland',
+    'odisha': 'Odisha',
+    'puducherry': 'Puducherry',
+    'punjab': 'Punjab',
+    'rajasthan': 'Rajasthan',
+    'sikkim': 'Sikkim',
+    'tamil-nadu': 'Tamil Nadu',
+    'telangana': 'Telangana',
+    'tripura': 'Tripura',
+    'uttar-pradesh': 'Uttar Pradesh',
+    'uttarakhand': 'Uttarakhand',
+    'west-bengal': 'West Bengal',
+}
+
+# Stable integer keys; category codes of normalize_states() are STATE_IDS - 1
+STATES = sorted(STATE_SLUGS.values())
+STATE_IDS = {state: i + 1 for i, state in enumerate(STATES)}
+
+
+def match_key(name):
+    # Spelling-insensitive key, so "Andaman & Nicobar" matches "Andaman And Nicobar Islands"
+    name = str(name).lower().replace('&', 'and')
+    name = re.sub(r'[^a-z]', '', name)
+    for suffix in ('islands', 'island', 'district'):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            name = name[:-len(suffix)]
+    # The transaction notebook wrote "Andaman and Nicobar and Islands"
+    if name.endswith('and') and len(name) > 3:
+        name = name[:-3]
+    return name
+
+
+# The slugs and the notebook's spellings (slug with spaces, its explicit
+# replacements, .title()) resolve through match_key
+_STATE_ALIASES = {match_key(state): state for state in STATES}
+
+
+@functools.lru_cache(maxsize=None)
+def canonical_state(raw):
+    state = STATE_SLUGS.get(raw) or _STATE_ALIASES.get(match_key(raw))
+    if state is None:
+        # Unknown slug: clean it the way the notebook did
+        state = raw.replace('-', ' ').title()
+    return state
+
+
+@functools.lru_cache(maxsize=None)
+def canonical_district(raw):
+    # Pulse district names are lower case with a trailing " district"
+    name = re.sub(r'\s+district$', '', str(raw).strip(), flags=re.IGNORECASE)
+    return name.title()
+
+
+def _normalize(values, canonical, categories=None):
+    codes, uniques = pd.factorize(pd.Series(values), sort=False)
+    names = [canonical(value) for value in uniques]
+    if categories is None:
+        categories = sorted(set(names))
+    else:
+        categories = categories + sorted(set(names) - set(categories))
+    lookup = pd.Index(categories).get_indexer(names)
+    # Missing values keep code -1
+    new_codes = lookup[codes] if len(lookup) else codes
+    new_codes[codes == -1] = -1
+    return pd.Categorical.from_codes(new_codes, categories=categories)
+
+
+def normalize_states(values):
+    return _normalize(values, canonical_state, list(STATES))
+
+
+def normalize_districts(values):
+    return _normalize(values, canonical_district)
+
+
+def state_ids(values):
+    # Integer keys matching dim_state.state_id; 0 for an unknown state
+    codes = normalize_states(values).codes.astype('int16') + 1
+    codes[codes > len(STATES)] = 0
+    return codes
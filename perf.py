@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from fileio import write_text
+
+# Named timing spans for the dashboard's hot paths.
+#
+# The data layer, the query gateway, the GeoJSON loader, the figure cache and
+# the page script wrap their stages in span('stage'); each span records its
+# wall time and, when the caller sets them, the rows and bytes it produced.
+# A script run is one request: finish_request() appends its spans as a JSON
+# line to PULSE_PERF_LOG and rewrites the Prometheus text file at
+# PULSE_PERF_PROM (for node_exporter's textfile collector), when those are set.
+# summary() feeds the hidden Performance page (PULSE_PERF_PAGE=1).
+
+ENABLED = os.environ.get('PULSE_PERF', '1') != '0'
+LOG_FILE = os.environ.get('PULSE_PERF_LOG')
+PROM_FILE = os.environ.get('PULSE_PERF_PROM')
+PANEL_ENABLED = os.environ.get('PULSE_PERF_PAGE', '0') == '1'
+SAMPLES = int(os.environ.get('PULSE_PERF_SAMPLES', 1000))
+RECENT_REQUESTS = 50
+
+_lock = threading.Lock()
+_stages = defaultdict(lambda: deque(maxlen=SAMPLES))
+_totals = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0})
+_requests = deque(maxlen=RECENT_REQUESTS)
+_local = threading.local()
+
+
+def frame_bytes(df):
+    # Shallow size; deep=True would walk every object string on the hot path
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+def _record(name, seconds, rows, nbytes):
+    with _lock:
+        _stages[name].append(seconds)
+        total = _totals[name]
+        total['count'] += 1
+        total['seconds'] += seconds
+        total['rows'] += rows or 0
+        total['bytes'] += nbytes or 0
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append({'stage': name, 'seconds': round(seconds, 6), 'rows': rows, 'bytes': nbytes})
+
+
+@contextmanager
+def span(name):
+    # with perf.span('load.transaction') as s: ...; s['rows'] = len(df)
+    stats = {'rows': None, 'bytes': None}
+    if not ENABLED:
+        yield stats
+        return
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        _record(name, time.perf_counter() - start, stats['rows'], stats['bytes'])
+
+
+def start_request():
+    # Spans recorded on this thread until finish_request() belong to the request
+    _local.started = time.perf_counter()
+    _local.spans = []
+
+
+def bind(fn):
+    # Runs fn on a worker thread with its spans counted towards the caller's request
+    spans = getattr(_local, 'spans', None)
+
+    def run(*args, **kwargs):
+        _local.spans = spans
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.spans = None
+    return run
+
+
+def finish_request(name):
+    spans = getattr(_local, 'spans', None)
+    if spans is None:
+        return None
+    request = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'request': name,
+        'seconds': round(time.perf_counter() - _local.started, 6),
+        'spans': spans,
+    }
+    _local.spans = None
+    if not ENABLED:
+        return request
+    _record(f'request.{request["request"]}', request['seconds'], None, None)
+    with _lock:
+        _requests.append(request)
+    if LOG_FILE:
+        with _lock, open(LOG_FILE, 'a') as f:
+            f.write(json.dumps(request) + '\n')
+    if PROM_FILE:
+        write_prometheus(PROM_FILE)
+    return request
+
+
+def _quantile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+def summary():
+    # {stage: {count, p50, p95, max, rows, bytes}} over the recent samples
+    with _lock:
+        stages = {name: sorted(samples) for name, samples in _stages.items()}
+        totals = {name: dict(total) for name, total in _totals.items()}
+    return {name: {
+        'count': totals[name]['count'],
+        'p50': _quantile(samples, 0.5),
+        'p95': _quantile(samples, 0.95),
+        'max': samples[-1] if samples else 0.0,
+        'rows': totals[name]['rows'],
+        'bytes': totals[name]['bytes'],
+    } for name, samples in sorted(stages.items())}
+
+
+def recent_requests():
+    with _lock:
+        return list(_requests)
+
+
+def prometheus_text():
+    # Prometheus exposition format, with the cache hit rates as gauges
+    lines = ['# TYPE pulse_stage_seconds summary']
+    stages = summary()
+    with _lock:
+        totals = {name: dict(total) for name, total in _totals.items()}
+    for name, stats in stages.items():
+        for quantile in ('0.5', '0.95'):
+            value = stats['p50'] if quantile == '0.5' else stats['p95']
+            lines.append(f'pulse_stage_seconds{{stage="{name}",quantile="{quantile}"}} {value:.6f}')
+        lines.append(f'pulse_stage_seconds_sum{{stage="{name}"}} {totals[name]["seconds"]:.6f}')
+        lines.append(f'pulse_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+    for metric, field in [('pulse_stage_rows_total', 'rows'), ('pulse_stage_bytes_total', 'bytes')]:
+        lines.append(f'# TYPE {metric} counter')
+        lines.extend(f'{metric}{{stage="{name}"}} {stats[field]}' for name, stats in stages.items())
+    for metric, values in cache_gauges().items():
+        lines.append(f'# TYPE {metric} gauge')
+        for labels, value in values.items():
+            label_text = ','.join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f'{metric}{{{label_text}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def cache_gauges():
+    # {metric: {labels: value}}; imported here so perf does not import what it measures
+    import figure_cache
+    import pulse_cache
+
+    gauges = defaultdict(dict)
+    for cache, stats in [('data', pulse_cache.CACHE.stats()), ('figure', figure_cache.stats())]:
+        for field in ('hit_rate', 'hits', 'misses', 'evictions', 'entries'):
+            gauges[f'pulse_cache_{field}'][(('cache', cache),)] = stats[field]
+    return gauges
+
+
+def write_prometheus(path):
+    # Written to a temporary file and renamed, so a scrape never reads half a file
+    write_text(path, prometheus_text())
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _totals.clear()
+        _requests.clear()
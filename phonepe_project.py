@@ -1,79 +1,35 @@
 import streamlit as st
-import plotly.express as px
-import mysql.connector
 import pandas as pd
-import requests
 
+import db
+import figure_cache
+import figures
+import insights
+import perf
+import pulse_cache
+import pulse_data
+import trends
 
-# Function to fetch data from MySQL
-def fetch_data():
-    # Connect to the database
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="phonepe_pulse",
-        auth_plugin='mysql_native_password'  # Specify the authentication plugin explicitly
-    )
+# Every script run is timed as one request, see perf.py
+perf.start_request()
 
-    query1 = """SELECT State, Year, Quarter, Transaction_amount, Transaction_count, name FROM transaction"""
-    query2 = """SELECT State, Year, Quarter, Transaction_amount AS map_Transaction_amount, 
-                Transaction_count AS map_Transaction_count, Districts FROM map_trans"""
-    query3 = """SELECT State, Year, Quarter, Transaction_amount AS top_Transaction_amount, 
-                Transaction_count AS top_Transaction_count, Entityname FROM top_transaction"""
 
-    df1 = pd.read_sql(query1, conn)
-    df2 = pd.read_sql(query2, conn)
-    df3 = pd.read_sql(query3, conn)
+def plotly_chart(fig):
+    # Streamlit's serialization of the figure, timed on its own
+    with perf.span('render.plotly_chart'):
+        st.plotly_chart(fig)
 
-    conn.close()
 
-    # Merge tables
-    df_merged3 = pd.merge(df1, df2, on=['State', 'Year', 'Quarter'], how='outer')
-    df_merged3 = pd.merge(df_merged3, df3, on=['State', 'Year', 'Quarter'], how='outer')
-    # Merge tables
-
-    # Select and rename columns to avoid duplication
-    df_merged3 = df_merged3[
-        ['State', 'Year', 'Quarter', 'Transaction_amount', 'Transaction_count', 'name', 'Districts', 'Entityname']]
-
-    # Display merged DataFrame
-    return df_merged3
-
-
-def Aggre_insurance_Y(df_merged4, year, quarter):
-    # Filter data for the selected year and quarter
-    df_filtered3 = df_merged4[(df_merged4['Year'] == year) & (df_merged4['Quarter'] == quarter)]
-
-    # Perform aggregation
-    df_agg3 = df_filtered3.groupby('State').agg({
-        'Transaction_count': 'sum',
-        'Transaction_amount': 'sum'
-    }).reset_index()
-
-    return df_agg3, df_filtered3
-
-
-def display_pie_chart(df_filtered4, selected_state2):
-    state_data = df_filtered4[df_filtered4['State'] == selected_state2]
-    if not state_data.empty:
-        # Use unique values of 'name' for the selected state
-        unique_names = state_data['name'].unique()
-        name_counts = pd.DataFrame({'name': unique_names, 'count': [1] * len(unique_names)})
-
-        fig_pie = px.pie(name_counts, names='name', values='count', title=f'{selected_state2} - Name Distribution')
-        st.plotly_chart(fig_pie)
-    else:
+def display_pie_chart(selected_state2, year, quarter):
+    if pulse_data.get_payment_breakdown(selected_state2, year, quarter).empty:
         st.write(f"No data available for {selected_state2}")
+        return
+    fig_pie = figure_cache.cached_figure('pie', (selected_state2, year, quarter),
+                                         lambda: figures.build_pie_chart(selected_state2, year, quarter))
+    plotly_chart(fig_pie)
 
 
-def display_plots(df_agg3, year, quarter):
-    # Load GeoJSON data for states
-    url = ("https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw"
-           "/e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson")
-    response = requests.get(url)
-    data_geojson = response.json()
-
+def display_plots(year, quarter):
     # Plotly Bar Charts
     st.title(f'{year} Q{quarter} Transactions')
     st.subheader('Transaction Amount and Count by State')
@@ -82,61 +38,65 @@ def display_plots(df_agg3, year, quarter):
 
     with col1:
         # Plot bar chart for Transaction Amount
-        fig_amount = px.bar(df_agg3, x='State', y='Transaction_amount',
-                            title=f'{year} Q{quarter} Transaction Amount by State',
-                            labels={'State': 'State', 'Transaction_amount': 'Transaction Amount'})
-        st.plotly_chart(fig_amount)
+        fig_amount = figure_cache.cached_figure(
+            'state_bar', (year, quarter, 'Transaction_amount'),
+            lambda: figures.build_state_bar(year, quarter, 'Transaction_amount', 'Transaction Amount'))
+        plotly_chart(fig_amount)
 
     with col2:
         # Plot bar chart for Transaction Count
-        fig_count = px.bar(df_agg3, x='State', y='Transaction_count',
-                           title=f'{year} Q{quarter} Transaction Count by State',
-                           labels={'State': 'State', 'Transaction_count': 'Transaction Count'})
-        st.plotly_chart(fig_count)
+        fig_count = figure_cache.cached_figure(
+            'state_bar', (year, quarter, 'Transaction_count'),
+            lambda: figures.build_state_bar(year, quarter, 'Transaction_count', 'Transaction Count'))
+        plotly_chart(fig_count)
 
     # Plotly Choropleth Maps
     st.title(f'{year} Q{quarter} Choropleth Maps')
+    if not figures.has_state_map():
+        st.info("State boundaries are not available; run `python geo.py` to build assets/india_states.geojson")
+        return
     st.subheader('Transaction Amount and Count by State')
 
     col3, col4 = st.columns(2)
 
     with col3:
         # Choropleth map for Transaction Amount
-        fig_amount_map = px.choropleth(df_agg3, geojson=data_geojson,
-                                       locations='State', featureidkey="properties.ST_NM",
-                                       color='Transaction_amount',
-                                       color_continuous_scale='Sunsetdark',
-                                       range_color=(
-                                           df_agg3['Transaction_amount'].min(), df_agg3['Transaction_amount'].max()),
-                                       hover_name='State',
-                                       labels={'Transaction_amount': 'Transaction Amount'})
-        fig_amount_map.update_geos(fitbounds="locations", visible=False)
-        st.plotly_chart(fig_amount_map)
+        fig_amount_map = figure_cache.cached_figure(
+            'state_map', (year, quarter, 'Transaction_amount'),
+            lambda: figures.build_state_map(year, quarter, 'Transaction_amount', 'Transaction Amount'))
+        plotly_chart(fig_amount_map)
 
     with col4:
         # Choropleth map for Transaction Count
-        fig_count_map = px.choropleth(df_agg3, geojson=data_geojson,
-                                      locations='State', featureidkey="properties.ST_NM",
-                                      color='Transaction_count',
-                                      color_continuous_scale='Sunsetdark',
-                                      range_color=(
-                                          df_agg3['Transaction_count'].min(), df_agg3['Transaction_count'].max()),
-                                      hover_name='State',
-                                      labels={'Transaction_count': 'Transaction Count'})
-        fig_count_map.update_geos(fitbounds="locations", visible=False)
-        st.plotly_chart(fig_count_map)
-
-
-# Fetch the data
-df_merged = fetch_data()
-
-# Extract unique years, quarters, and states
-years = sorted(df_merged['Year'].unique())
-quarters = sorted(df_merged['Quarter'].unique())
-states = sorted(df_merged['State'].unique())
+        fig_count_map = figure_cache.cached_figure(
+            'state_map', (year, quarter, 'Transaction_count'),
+            lambda: figures.build_state_map(year, quarter, 'Transaction_count', 'Transaction Count'))
+        plotly_chart(fig_count_map)
+
+
+def display_district_map(state, year, quarter):
+    # District choropleth for one state, drawn only when the district GeoJSON has been built
+    if not figures.has_district_map(state, year, quarter):
+        return
+    fig_district_map = figure_cache.cached_figure('district_map', (state, year, quarter),
+                                                  lambda: figures.build_district_map(state, year, quarter))
+    plotly_chart(fig_district_map)
+
+
+# Extract unique years, quarters, and states; each page then loads only its slice
+years, quarters, states = pulse_data.get_keys()
 
 # Define the pages
-pages = ["Home", "Explore Insurance Data", "Explore Transaction Data", "Explore User Data", "Insights"]
+pages = ["Home", "Explore Insurance Data", "Explore Transaction Data", "Explore User Data", "Trends", "Insights"]
+# Hidden unless PULSE_PERF_PAGE=1
+if perf.PANEL_ENABLED:
+    pages.append("Performance")
+
+# (state source, district source, measures) for the Trends page
+TREND_DATASETS = {
+    "Transactions": ('transaction', 'map_trans', ['Transaction_amount', 'Transaction_count']),
+    "Users": ('map_user', 'map_user', ['RegisteredUser', 'AppOpens']),
+}
 
 # Streamlit App
 page = st.sidebar.selectbox("Select a page", pages)
@@ -169,11 +129,8 @@ elif page == "Explore Insurance Data":
     selected_year = st.selectbox('Select a year', years)
     selected_quarter = st.selectbox('Select a Quarter', quarters)
 
-    # Call the aggregation function with the selected year and quarter
-    df_agg, df_filtered = Aggre_insurance_Y(df_merged, selected_year, selected_quarter)
-
-    # Display the plots
-    display_plots(df_agg, selected_year, selected_quarter)
+    # Display the plots for the selected year and quarter
+    display_plots(selected_year, selected_quarter)
 
 elif page == "Explore Transaction Data":
     st.title('Transaction Data Analysis')
@@ -183,314 +140,157 @@ elif page == "Explore Transaction Data":
     selected_quarter = st.selectbox('Select a Quarter', quarters)
     selected_state = st.selectbox('Select a State', states)
 
-    # Call the aggregation function with the selected year and quarter
-    df_agg, df_filtered = Aggre_insurance_Y(df_merged, selected_year, selected_quarter)
+    # The three reads run at once; a failed one only hides its own charts
+    selection = (selected_state, selected_year, selected_quarter)
+    page_data = pulse_data.fetch_concurrent({
+        'state totals': lambda: pulse_data.get_state_rollup(selected_year, selected_quarter),
+        'payment breakdown': lambda: pulse_data.get_payment_breakdown(*selection),
+        'district breakdown': lambda: pulse_data.get_district_breakdown(*selection),
+    })
+    for name, err in page_data.errors.items():
+        st.error(f"Could not load the {name}: {err}")
 
-    # Display the plots
-    display_plots(df_agg, selected_year, selected_quarter)
+    # Display the plots for the selected year and quarter
+    if 'state totals' in page_data.results:
+        display_plots(selected_year, selected_quarter)
 
     # Display the pie chart for the selected state
-    st.subheader(f'Distribution of Transactions by Name in {selected_state}')
-    display_pie_chart(df_filtered, selected_state)
-
-elif page == "Explore User Data":
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="phonepe_pulse",
-            auth_plugin='mysql_native_password'  # Specify the authentication plugin explicitly
-        )
+    if 'payment breakdown' in page_data.results:
+        st.subheader(f'Distribution of Transactions by Name in {selected_state}')
+        display_pie_chart(selected_state, selected_year, selected_quarter)
 
-        # Check if the connection was successful
-        if conn.is_connected():
-            st.write("Connected to the database successfully!")
+    # Display the district map for the selected state
+    if 'district breakdown' in page_data.results:
+        display_district_map(selected_state, selected_year, selected_quarter)
 
-        query4 = """SELECT State, Year, Quarter, Transaction_count, Brands, Percentage FROM agg_user"""
-        query5 = """SELECT State, Year, Quarter, Districts, RegisteredUser, AppOpens FROM map_user"""
-        query6 = """SELECT State, Year, Quarter, Districts, RegisteredUser FROM top_user"""
-
-        df4 = pd.read_sql(query4, conn)
-        print(df4)
-        df5 = pd.read_sql(query5, conn)
-        df6 = pd.read_sql(query6, conn)
-
-        conn.close()
-
-        df_merged1 = pd.merge(df4, df5, on=['State', 'Year', 'Quarter'], how='outer')
-        df_merged1 = pd.merge(df_merged1, df6, on=['State', 'Year', 'Quarter'], how='outer')
-
-        selected_state = st.sidebar.selectbox('Select State', df_merged1['State'].unique())
-        selected_year = st.sidebar.selectbox('Select Year', df_merged1['Year'].unique())
-        selected_quarter = st.sidebar.selectbox('Select Quarter', df_merged1['Quarter'].unique())
-
-        fig1 = px.bar(df4, x='State', y='Transaction_count', title='Transaction Count', height=650, width=500)
-        st.plotly_chart(fig1)
-
-        fig2 = px.bar(df5, x='State', y='RegisteredUser', title='Registered Users')
-        st.plotly_chart(fig2)
-
-        fig3 = px.bar(df4, x='State', y='Brands', title='Brands')
-        st.plotly_chart(fig3)
-
-        fig5 = px.bar(df5, x='State', y='AppOpens', title='App Opens')
-        st.plotly_chart(fig5)
-
-    except mysql.connector.Error as err:
-        st.write(f"Error: {err}")
+elif page == "Explore User Data":
+    selected_state = st.sidebar.selectbox('Select State', states)
+    selected_year = st.sidebar.selectbox('Select Year', years)
+    selected_quarter = st.sidebar.selectbox('Select Quarter', quarters)
+
+    # Only the selected year and quarter are read, both tables at once
+    page_data = pulse_data.fetch_concurrent({
+        table: lambda table=table: pulse_data.get_slice(table, selected_year, selected_quarter)
+        for table in ['agg_user', 'map_user']
+    })
+
+    # A table that failed to load only hides its charts
+    for table, y, title, layout in figures.USER_CHARTS:
+        if table in page_data.errors:
+            st.error(f"Could not load {title}: {page_data.errors[table]}")
+            continue
+        fig = figure_cache.cached_figure('user', (selected_year, selected_quarter, y),
+                                         lambda: figures.build_user_bar(table, selected_year, selected_quarter,
+                                                                        y, title, **layout))
+        plotly_chart(fig)
+
+elif page == "Trends":
+    st.title('Trends')
+
+    selected_dataset = st.selectbox('Select a dataset', list(TREND_DATASETS))
+    state_source, district_source, measures = TREND_DATASETS[selected_dataset]
+    selected_measure = st.selectbox('Select a measure', measures, format_func=trends.MEASURE_LABELS.get)
+    label = trends.MEASURE_LABELS[selected_measure]
+
+    matrix = trends.state_cube(selected_measure, state_source)
+    if matrix.empty:
+        st.write("No data available")
+    else:
+        # Default to the five largest states in the latest quarter
+        default_states = list(matrix.iloc[-1].sort_values(ascending=False).index[:5])
+        selected_states = st.multiselect('Select States', list(matrix.columns), default=default_states)
+        selection = (selected_measure, state_source) + tuple(selected_states)
+
+        def trend_line(view, title, y_label):
+            return figures.build_trend_line(view, selected_states, title, y_label)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            plotly_chart(figure_cache.cached_figure(
+                'trend_total', selection, lambda: trend_line(matrix, f'{label} by Quarter', label)))
+        with col2:
+            plotly_chart(figure_cache.cached_figure(
+                'trend_rolling', selection,
+                lambda: trend_line(trends.rolling_sum(matrix), f'{label}, Rolling 4-Quarter Sum', label)))
+
+        col3, col4 = st.columns(2)
+        with col3:
+            plotly_chart(figure_cache.cached_figure(
+                'trend_qoq', selection,
+                lambda: trend_line(trends.growth(matrix, 1), 'Quarter-over-Quarter Growth (%)', 'Growth (%)')))
+        with col4:
+            plotly_chart(figure_cache.cached_figure(
+                'trend_yoy', selection,
+                lambda: trend_line(trends.growth(matrix, 4), 'Year-over-Year Growth (%)', 'Growth (%)')))
+
+        st.subheader(f'Top Movers in {matrix.index[-1]} (Quarter-over-Quarter)')
+        risers, fallers = trends.top_movers(matrix)
+        col5, col6 = st.columns(2)
+        with col5:
+            st.write("Largest rises")
+            st.dataframe(risers)
+        with col6:
+            st.write("Largest falls")
+            st.dataframe(fallers)
+
+        selected_state = st.selectbox('Select a State for district movers', list(matrix.columns))
+        district_matrix = trends.district_cube(selected_state, selected_measure, district_source)
+        if not district_matrix.empty:
+            st.subheader(f'Top District Movers in {selected_state}')
+            risers, fallers = trends.top_movers(district_matrix)
+            col7, col8 = st.columns(2)
+            with col7:
+                st.write("Largest rises")
+                st.dataframe(risers)
+            with col8:
+                st.write("Largest falls")
+                st.dataframe(fallers)
 
 elif page == "Insights":
 
     if "selectbox_enabled" not in st.session_state:
         st.session_state["selectbox_enabled"] = False
 
-
-    def questions(selected_option1):
-
-        conn1 = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="phonepe_pulse",
-            auth_plugin='mysql_native_password'
-        )
-
-        mycursor = conn1.cursor()
-        conn1.commit()
-        if selected_option1 == "1. Sum of Transaction Count in the Aggregated Insurance by State wise":
-            mycursor.execute("""SELECT State, SUM(Transaction_count) as SUM_Transaction_count, Quarter 
-                                FROM insurance
-                                GROUP BY State, Quarter
-                                ORDER BY SUM_Transaction_Count DESC, State DESC;""")
-            result1 = mycursor.fetchall()
-            df_top_count = pd.DataFrame(result1, columns=("states", "transaction_count", "quarter"))
-
-            fig_top = px.bar(
-                df_top_count,
-                x='states',
-                y='transaction_count',
-                title='TRANSACTION COUNT',
-                hover_name='states',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_top
-
-        elif selected_option1 == "2. Top Brands in the Aggregated User by State wise":
-            mycursor.execute("""SELECT State, Brands, SUM(Transaction_count) AS Total_Transaction_count
-                                FROM agg_user
-                                GROUP BY State, Brands
-                                ORDER BY Total_Transaction_count DESC;
-                                """)
-            result2 = mycursor.fetchall()
-            df_brands = pd.DataFrame(result2, columns=("state", "brand", "total_transaction_count"))
-
-            fig_brands = px.bar(
-                df_brands,
-                x='state',
-                y='brand',
-                title='Top 10 Brands by Total Transaction Count',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_brands
-
-        elif selected_option1 == "3. Top 10 Transaction amount by Districts in Map Insurance":
-            mycursor.execute("""SELECT State, Districts, SUM(Transaction_amount) AS Total_Transaction_amount
-                                FROM map_trans
-                                GROUP BY State, Districts 
-                                ORDER BY Total_Transaction_amount DESC
-                                LIMIT 10;""")
-            result3 = mycursor.fetchall()
-            df_dists = pd.DataFrame(result3, columns=("state", "districts", "total_transaction_amount"))
-
-            fig_dist = px.bar(
-                df_dists,
-                x='districts',
-                y='total_transaction_amount',
-                title='Total Transaction Amount by Districts',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=["rgb(0, 123, 255)"],  # Change this to your desired color
-                height=650,
-                width=600
-            )
-            return fig_dist
-
-        elif selected_option1 == "4. Highest AppOpens in map_user":
-            mycursor.execute("""SELECT State, SUM(AppOpens) as Appopens, Quarter 
-                                FROM map_user
-                                GROUP BY State, Quarter
-                                ORDER BY Appopens DESC, State DESC;""")
-            result4 = mycursor.fetchall()
-            df_app = pd.DataFrame(result4, columns=("state", "appopens", "quarter"))
-
-            fig_app = px.bar(
-                df_app,
-                x='state',
-                y='appopens',
-                title='Highest AppOpens',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_app
-
-        elif selected_option1 == "5. Highest Registered User in map_user":
-            mycursor.execute("""SELECT State, SUM(RegisteredUser) as Registered_User, Quarter 
-                                FROM map_user
-                                GROUP BY State, Quarter
-                                ORDER BY Registered_User DESC, State DESC;""")
-            result5 = mycursor.fetchall()
-            df_reg = pd.DataFrame(result5, columns=("state", "registered_user", "quarter"))
-
-            fig_reg = px.bar(
-                df_reg,
-                x='state',
-                y='registered_user',
-                title='Highest Registered User',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_reg
-        elif selected_option1 == "6. Highest Registered User in Top User":
-            mycursor.execute("""SELECT State, SUM(RegisteredUser) as Registered_User, Quarter 
-                                FROM top_user
-                                GROUP BY State, Quarter
-                                ORDER BY Registered_User DESC, State DESC;""")
-            result6 = mycursor.fetchall()
-            df_reg_top = pd.DataFrame(result6, columns=("state", "registered_user", "quarter"))
-
-            fig_reg_top = px.bar(
-                df_reg_top,
-                x='state',
-                y='registered_user',
-                title='Highest Registered User',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_reg_top
-
-        elif selected_option1 == "7. Top States by Transaction Count in Insurance":
-            mycursor.execute("""SELECT State, SUM(Transaction_count) as 'Transaction Count', Quarter 
-                                FROM top_insurance
-                                GROUP BY State, Quarter
-                                ORDER BY 'Transaction Count' DESC, State DESC;""")
-            result7 = mycursor.fetchall()
-            df_top_trans = pd.DataFrame(result7, columns=("state", "transaction count", "quarter"))
-
-            fig_top = px.bar(
-                df_top_trans,
-                x='state',
-                y='transaction count',
-                title='Top Transaction count',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_top
-
-
-        elif selected_option1 == "8. Highest transaction amount in the Map Transactions dataset.":
-            mycursor.execute("""SELECT State, SUM(Transaction_amount) as 'Transaction amount', Quarter 
-                                FROM map_trans
-                                GROUP BY State, Quarter
-                                ORDER BY 'Transaction amount' DESC, State DESC;""")
-            result8 = mycursor.fetchall()
-            df_map_trans = pd.DataFrame(result8, columns=("state", "transaction amount", "quarter"))
-
-            fig_map = px.bar(
-                df_map_trans,
-                x='state',
-                y='transaction amount',
-                title='Top Transaction amount',
-                hover_name='state',
-                color='state',
-                color_discrete_sequence=px.colors.carto.Darkmint,
-                height=650,
-                width=600
-            )
-            return fig_map
-
-        elif selected_option1 == "9. Transaction Amount by Payment Method and State":
-            mycursor.execute("""SELECT State, name as Payment, SUM(transaction_amount) as Transaction_Amount 
-                                FROM transaction 
-                                GROUP BY State, Payment
-                                ORDER BY State, Payment;""")
-            result = mycursor.fetchall()
-            df = pd.DataFrame(result, columns=("state", "payment", "transaction_amount"))
-
-            fig6 = px.bar(
-                df,
-                x='state',
-                y='transaction_amount',
-                color='payment',
-                title='Transaction Amount by Payment Method and State',
-                hover_name='state',
-                barmode='group',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=800
-            )
-            return fig6
-
-        elif selected_option1 == "10. Transaction Count by Payment Method and State":
-            mycursor.execute("""SELECT State, name as Payment, SUM(Transaction_Count) as Transaction_Count 
-                                FROM transaction 
-                                GROUP BY State, Payment
-                                ORDER BY State, Payment;""")
-            result10 = mycursor.fetchall()
-            df = pd.DataFrame(result10, columns=("state", "payment", "transaction_count"))
-
-            fig4 = px.bar(
-                df,
-                x='state',
-                y='transaction_count',
-                color='payment',
-                title='Transaction Count by Payment Method and State',
-                hover_name='state',
-                barmode='group',
-                color_discrete_sequence=px.colors.sequential.Darkmint,
-                height=650,
-                width=500
-            )
-            return fig4
-
-
     # Streamlit app
     st.title("Transaction Data Visualization")
 
-    selected_option1 = st.selectbox(
-        "Choose an option",
-        ["1. Sum of Transaction Count in the Aggregated Insurance by State wise",
-         "2. Top Brands in the Aggregated User by State wise",
-         "3. Top 10 Transaction amount by Districts in Map Insurance",
-         "4. Highest AppOpens in map_user",
-         "5. Highest Registered User in map_user",
-         "6. Highest Registered User in Top User",
-         "7. Top States by Transaction Count in Insurance",
-         "8. Highest transaction amount in the Map Transactions dataset.",
-         "9. Transaction Amount by Payment Method and State",
-         "10. Transaction Count by Payment Method and State"]
-    )
+    selected_option1 = st.selectbox("Choose an option", list(insights.INSIGHTS))
 
     if selected_option1:
         st.session_state["selectbox_enabled"] = True
-        fig = questions(selected_option1)
+        fig = figure_cache.cached_figure('insights', (selected_option1,),
+                                         lambda: insights.build_figure(selected_option1))
         if fig:
-            st.plotly_chart(fig)
+            plotly_chart(fig)
+
+elif page == "Performance":
+    st.title('Performance')
+
+    st.subheader('Stages')
+    stages = perf.summary()
+    if stages:
+        st.dataframe(pd.DataFrame([
+            {'stage': name, 'count': stats['count'], 'p50 (ms)': stats['p50'] * 1000,
+             'p95 (ms)': stats['p95'] * 1000, 'max (ms)': stats['max'] * 1000,
+             'rows': stats['rows'], 'bytes': stats['bytes']}
+            for name, stats in stages.items()]))
+    else:
+        st.write("No spans recorded yet")
+
+    st.subheader('Caches')
+    st.dataframe(pd.DataFrame([dict(cache='data', **pulse_cache.CACHE.stats()),
+                               dict(cache='figure', **figure_cache.stats())]))
+
+    if pulse_data.DATA_SOURCE == 'mysql':
+        st.subheader('Database')
+        metrics = db.metrics()
+        st.write(f"Pool size {metrics['pool_size']}, connection wait p95 "
+                 f"{metrics['pool_wait']['p95'] * 1000:.1f} ms over {metrics['pool_wait']['count']} checkouts")
+        st.dataframe(pd.DataFrame([dict(query=name, **stats) for name, stats in metrics['queries'].items()]))
+
+    st.subheader('Recent requests')
+    st.dataframe(pd.DataFrame([{'time': request['time'], 'page': request['request'],
+                                'seconds': request['seconds'], 'spans': len(request['spans'])}
+                               for request in reversed(perf.recent_requests())]))
+
+perf.finish_request(page)
@@ -0,0 +1,122 @@
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fileio import write_text
+
+# Process-wide cache for the dashboard.
+#
+# Streamlit reruns the page script on every widget change, but imported
+# modules live for the whole server process, so one cache here is shared by
+# every session. Entries expire after a TTL and are dropped as soon as the
+# loader publishes a new data version; past max_entries the least recently
+# used entry is evicted, so memory stays bounded as more quarters are viewed.
+
+DEFAULT_TTL = int(os.environ.get('PULSE_CACHE_TTL', 600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('PULSE_CACHE_MAX_ENTRIES', 256))
+VERSION_FILE = os.environ.get('PULSE_VERSION_FILE',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data_version'))
+
+
+def data_version():
+    try:
+        with open(VERSION_FILE, 'r') as f:
+            return f.read().strip() or '0'
+    except FileNotFoundError:
+        return '0'
+
+
+def publish_data_version():
+    # Called by the loader once a load has finished
+    version = str(time.time_ns())
+    write_text(VERSION_FILE, version)
+    CACHE.invalidate()
+    return version
+
+
+class TTLCache:
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _fresh(self, entry, version):
+        value, stored_at, stored_version = entry
+        return stored_version == version and time.monotonic() - stored_at < self.ttl
+
+    def get_or_load(self, key, loader):
+        version = data_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry, version):
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one session loads a given key; the others wait and reuse it
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and self._fresh(entry, version):
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic(), version)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+                    self.evictions += 1
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'version': data_version(),
+            }
+
+
+CACHE = TTLCache()
+
+
+def cached(key, loader):
+    return CACHE.get_or_load(key, loader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard cache control')
+    parser.add_argument('--refresh', action='store_true', help='publish a new data version')
+    args = parser.parse_args()
+    if args.refresh:
+        print(f"Published data version {publish_data_version()}")
+    else:
+        print(f"Current data version {data_version()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import db
+import dtypes
+import perf
+import pulse_cache
+import snapshot
+from normalize import normalize_states
+
+# Data layer for the dashboard.
+#
+# The transaction facts are read as three separate tables instead of one
+# outer-merged frame. Merging on only (State, Year, Quarter) multiplies
+# every payment category by every district and every top entity, which
+# blows the frame up and over-counts the sums (benchmarks/legacy.py keeps
+# that model for comparison).
+#
+# The pages read through the get_* query API below, which pushes the
+# Year/Quarter/State predicates (and the GROUP BY) down into SQL or into the
+# Parquet scan and memoizes each result per key in the LRU-bounded
+# process cache, so an interaction only touches the slice being shown.
+# Pages that need several independent reads issue them together through
+# fetch_concurrent(), so they wait for the slowest read instead of the sum.
+
+KEY = ['State', 'Year', 'Quarter']
+
+# 'mysql' reads through the query gateway, 'parquet' reads the snapshot files
+DATA_SOURCE = os.environ.get('PULSE_DATA_SOURCE', 'mysql')
+
+TRANSACTION_COLUMNS = {
+    'transaction': KEY + ['Transaction_amount', 'Transaction_count', 'name'],
+    'map_trans': KEY + ['Transaction_amount', 'Transaction_count', 'Districts'],
+    'top_transaction': KEY + ['Transaction_amount', 'Transaction_count', 'Entityname'],
+}
+
+USER_COLUMNS = {
+    'agg_user': KEY + ['Transaction_count', 'Brands', 'Percentage'],
+    'map_user': KEY + ['Districts', 'RegisteredUser', 'AppOpens'],
+    'top_user': KEY + ['Districts', 'RegisteredUser'],
+}
+
+TABLE_COLUMNS = dict(TRANSACTION_COLUMNS, **USER_COLUMNS)
+
+# Seconds a page waits for its concurrent reads before reporting them as timed out
+QUERY_TIMEOUT = float(os.environ.get('PULSE_QUERY_TIMEOUT', 60))
+
+# results: {name: value} of the reads that returned; errors: {name: exception} of the rest
+PageData = namedtuple('PageData', ['results', 'errors'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def read_table(table, columns, filters=None):
+    # filters is a {column: value} dict, applied in SQL or as Parquet partition filters
+    if DATA_SOURCE == 'parquet':
+        return snapshot.read_table(table, columns, filters)
+    sql = f"SELECT {', '.join(columns)} FROM `{table}`"
+    if filters:
+        sql += ' WHERE ' + ' AND '.join(f'{column} = %s' for column in filters)
+    return db.query(sql, tuple(filters.values()) if filters else None, name=table)
+
+
+def fetch_table(table, columns, filters=None):
+    # As read_table, converted to the declared dtypes (canonical State categories included)
+    with perf.span(f'load.{table}') as span:
+        df = dtypes.apply_schema(read_table(table, columns, filters))
+        span['rows'], span['bytes'] = len(df), perf.frame_bytes(df)
+    return df
+
+
+def fetch_aggregate(table, group_columns, measures, filters=None):
+    # SUM(measures) GROUP BY group_columns over the filtered slice
+    with perf.span(f'aggregate.{table}') as span:
+        if DATA_SOURCE == 'parquet':
+            df = dtypes.apply_schema(snapshot.read_table(table, group_columns + measures, filters))
+            df = df.groupby(group_columns, as_index=False, observed=True)[measures].sum()
+        else:
+            groups = ', '.join(group_columns)
+            sql = f"SELECT {groups}, {', '.join(f'SUM({m}) AS {m}' for m in measures)} FROM `{table}`"
+            if filters:
+                sql += ' WHERE ' + ' AND '.join(f'{column} = %s' for column in filters)
+            sql += f" GROUP BY {groups}"
+            df = db.query(sql, tuple(filters.values()) if filters else None, name=f'{table}_aggregate')
+            # MySQL returns SUM() as Decimal; the schema makes counts int64 and amounts float64
+            df = dtypes.apply_schema(df)
+        span['rows'], span['bytes'] = len(df), perf.frame_bytes(df)
+    return df
+
+
+def summary_rows(sql, params=None, name=None):
+    # The Insights and Trends SQL only touches the dimension and summary tables
+    with perf.span(f'summary.{name or "query"}') as span:
+        if DATA_SOURCE == 'parquet':
+            rows = snapshot.summary_rows(sql, params or ())
+        else:
+            rows = db.fetchall(sql, params, name=name)
+        span['rows'] = len(rows)
+    return rows
+
+
+def get_executor():
+    # One worker per pooled connection; more threads would only queue on the pool
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=db.POOL_SIZE, thread_name_prefix='pulse-read')
+        return _executor
+
+
+def fetch_concurrent(loaders, timeout=QUERY_TIMEOUT):
+    # loaders is {name: zero-argument callable}. A failed or timed-out read is
+    # reported in errors and does not discard the reads that succeeded.
+    futures = {get_executor().submit(perf.bind(loader)): name for name, loader in loaders.items()}
+    done, pending = wait(futures, timeout=timeout)
+    results, errors = {}, {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as err:
+            # Any source can fail: MySQL, the Parquet scan, the snapshot's SQLite
+            # copy or the dtype schema; only that read is reported as failed
+            errors[futures[future]] = err
+    for future in pending:
+        # A read already running finishes in the background and is discarded
+        future.cancel()
+        errors[futures[future]] = db.QueryTimeout(f"{futures[future]} did not return within {timeout}s")
+    return PageData(results, errors)
+
+
+def slice_filters(year, quarter, state=None):
+    # Native ints, since the selectboxes hand back numpy scalars
+    filters = {'Year': int(year), 'Quarter': int(quarter)}
+    if state is not None:
+        filters['State'] = str(state)
+    return filters
+
+
+def get_keys():
+    # Selector values from the small state x quarter summary table
+    def load():
+        rows = summary_rows("""SELECT DISTINCT d.State, s.Year, s.Quarter
+                               FROM summary_state_quarter s JOIN dim_state d ON d.state_id = s.state_id""",
+                            name='keys')
+        return (sorted({row[1] for row in rows}), sorted({row[2] for row in rows}),
+                list(normalize_states([row[0] for row in rows]).unique().sort_values()))
+    return pulse_cache.cached(('keys',), load)
+
+
+def get_periods():
+    # (Year, Quarter) pairs that have data, unlike the cross product of get_keys()
+    def load():
+        rows = summary_rows("SELECT DISTINCT Year, Quarter FROM summary_state_quarter", name='periods')
+        return sorted((int(year), int(quarter)) for year, quarter in rows)
+    return pulse_cache.cached(('periods',), load)
+
+
+def get_state_rollup(year, quarter):
+    filters = slice_filters(year, quarter)
+    return pulse_cache.cached(
+        ('state_rollup', filters['Year'], filters['Quarter']),
+        lambda: fetch_aggregate('transaction', ['State'], ['Transaction_count', 'Transaction_amount'], filters))
+
+
+def get_payment_breakdown(state, year, quarter):
+    filters = slice_filters(year, quarter, state)
+    return pulse_cache.cached(
+        ('payment_breakdown',) + tuple(filters.values()),
+        lambda: fetch_table('transaction', ['State', 'name', 'Transaction_count', 'Transaction_amount'], filters))
+
+
+def get_district_breakdown(state, year, quarter, table='map_trans'):
+    filters = slice_filters(year, quarter, state)
+    columns = [column for column in TABLE_COLUMNS[table] if column not in KEY]
+    return pulse_cache.cached(
+        ('district_breakdown', table) + tuple(filters.values()),
+        lambda: fetch_table(table, ['State'] + columns, filters))
+
+
+def get_slice(table, year, quarter):
+    filters = slice_filters(year, quarter)
+    return pulse_cache.cached(
+        ('slice', table, filters['Year'], filters['Quarter']),
+        lambda: fetch_table(table, TABLE_COLUMNS[table], filters))
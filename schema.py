@@ -0,0 +1,306 @@
+import argparse
+import re
+import sqlite3
+
+import db
+from ingest.load import add_unique_key, is_sqlite
+from ingest.specs import DATASETS
+from normalize import STATE_IDS, canonical_state
+
+# Schema migrations and summary tables for the Insights queries.
+#
+# migrate() is idempotent and safe to run after every load: it creates the
+# state/district dimension tables and the summary tables, gives every fact
+# table integer state_id/district_id keys, a unique (State, Year, Quarter,
+# dimension) key, composite (State, Year, Quarter) and (Year, Quarter)
+# indexes and native numeric column types.
+# refresh_summaries() rebuilds the state x quarter, state x district,
+# state x payment-type and state x brand tables that the Insights and Trends
+# pages read instead of scanning the fact tables, either in full or for just
+# the quarters a load touched.
+
+# Measures summed into the summary tables, per fact table
+MEASURES = {
+    'insurance': ['Transaction_count', 'Transaction_amount'],
+    'transaction': ['Transaction_count', 'Transaction_amount'],
+    'agg_user': ['Transaction_count'],
+    'map_insurance': ['Transaction_count', 'Transaction_amount'],
+    'map_trans': ['Transaction_count', 'Transaction_amount'],
+    'map_user': ['RegisteredUser', 'AppOpens'],
+    'top_insurance': ['Transaction_count', 'Transaction_amount'],
+    'top_transaction': ['Transaction_count', 'Transaction_amount'],
+    'top_user': ['RegisteredUser'],
+}
+SUMMARY_MEASURES = ['Transaction_count', 'Transaction_amount', 'RegisteredUser', 'AppOpens']
+
+# Fact tables whose dimension column is a district
+DISTRICT_TABLES = ['map_insurance', 'map_trans', 'map_user', 'top_user']
+
+# Native MySQL types for the columns the notebook created as DECIMAL/VARCHAR(100)
+COLUMN_TYPES = {
+    'State': 'VARCHAR(64)',
+    'Transaction_count': 'BIGINT',
+    'Transaction_amount': 'DOUBLE',
+    'Percentage': 'DOUBLE',
+    'RegisteredUser': 'BIGINT',
+    'AppOpens': 'BIGINT',
+}
+
+MEASURE_COLUMNS = ', '.join(f'{measure} {COLUMN_TYPES[measure]} NOT NULL DEFAULT 0'
+                            for measure in SUMMARY_MEASURES)
+
+SUMMARY_TABLES = {
+    'summary_state_quarter': f"""(source VARCHAR(32) NOT NULL, state_id SMALLINT NOT NULL,
+                                  Year SMALLINT NOT NULL, Quarter TINYINT NOT NULL, {MEASURE_COLUMNS},
+                                  PRIMARY KEY (source, state_id, Year, Quarter))""",
+    'summary_state_district': f"""(source VARCHAR(32) NOT NULL, state_id SMALLINT NOT NULL,
+                                   district_id INT NOT NULL, Year SMALLINT NOT NULL, Quarter TINYINT NOT NULL,
+                                   {MEASURE_COLUMNS},
+                                   PRIMARY KEY (source, state_id, district_id, Year, Quarter))""",
+    'summary_state_payment': f"""(state_id SMALLINT NOT NULL, name VARCHAR(64) NOT NULL,
+                                  Year SMALLINT NOT NULL, Quarter TINYINT NOT NULL, {MEASURE_COLUMNS},
+                                  PRIMARY KEY (state_id, name, Year, Quarter))""",
+    'summary_state_brand': f"""(state_id SMALLINT NOT NULL, Brands VARCHAR(64) NOT NULL,
+                                Year SMALLINT NOT NULL, Quarter TINYINT NOT NULL, {MEASURE_COLUMNS},
+                                PRIMARY KEY (state_id, Brands, Year, Quarter))""",
+}
+
+
+def dimension_tables(conn):
+    if is_sqlite(conn):
+        return {
+            'dim_state': """(state_id INTEGER PRIMARY KEY, State VARCHAR(64) NOT NULL UNIQUE)""",
+            'dim_district': """(district_id INTEGER PRIMARY KEY, state_id SMALLINT NOT NULL,
+                                District VARCHAR(64) NOT NULL, UNIQUE (state_id, District))""",
+        }
+    return {
+        'dim_state': """(state_id SMALLINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                         State VARCHAR(64) NOT NULL UNIQUE)""",
+        'dim_district': """(district_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY, state_id SMALLINT NOT NULL,
+                            District VARCHAR(64) NOT NULL, UNIQUE (state_id, District))""",
+    }
+
+
+def fact_tables():
+    return [DATASETS[name].table for name in MEASURES]
+
+
+def existing_tables(cursor, conn):
+    if is_sqlite(conn):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    else:
+        cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()")
+    return {row[0].lower() for row in cursor.fetchall()}
+
+
+def column_types(cursor, conn, table):
+    if is_sqlite(conn):
+        cursor.execute(f"PRAGMA table_info(`{table}`)")
+        return {row[1]: row[2].lower() for row in cursor.fetchall()}
+    # COLUMN_TYPE carries the length, so VARCHAR(100) is not taken for VARCHAR(64);
+    # integer display widths (bigint(20) before MySQL 8.0.19) are dropped
+    cursor.execute("""SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""", (table,))
+    return {row[0]: re.sub(r'^(tinyint|smallint|mediumint|int|bigint)\(\d+\)', r'\1', row[1].lower())
+            for row in cursor.fetchall()}
+
+
+def create_index(cursor, conn, table, index, columns):
+    if is_sqlite(conn):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON `{table}` ({columns})")
+        return
+    cursor.execute("""SELECT COUNT(*) FROM information_schema.STATISTICS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s""",
+                   (table, index))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"CREATE INDEX {index} ON `{table}` ({columns})")
+
+
+def migrate_fact_table(cursor, conn, name):
+    table = DATASETS[name].table
+    columns = column_types(cursor, conn, table)
+
+    # Integer keys into the dimension tables
+    if 'state_id' not in columns:
+        cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN state_id SMALLINT")
+    if table in DISTRICT_TABLES and 'district_id' not in columns:
+        cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN district_id INT")
+
+    # SQLite stores by value affinity, so only MySQL needs the type changes
+    if not is_sqlite(conn):
+        changes = [f'MODIFY {column} {sql_type}' for column, sql_type in COLUMN_TYPES.items()
+                   if column in columns and columns[column] != sql_type.lower()]
+        if changes:
+            cursor.execute(f"ALTER TABLE `{table}` {', '.join(changes)}")
+
+    # The (State, Year, Quarter, dimension) key the loader's upsert relies on
+    add_unique_key(cursor, conn, name)
+
+    create_index(cursor, conn, table, f'ix_{table}_state_year_quarter', 'State, Year, Quarter')
+    create_index(cursor, conn, table, f'ix_{table}_state_id_year_quarter', 'state_id, Year, Quarter')
+    # Serves the per-quarter slices the dashboard reads
+    create_index(cursor, conn, table, f'ix_{table}_year_quarter', 'Year, Quarter')
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    for table, definition in list(dimension_tables(conn).items()) + list(SUMMARY_TABLES.items()):
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} {definition}")
+
+    tables = existing_tables(cursor, conn)
+    for name in MEASURES:
+        if DATASETS[name].table in tables:
+            migrate_fact_table(cursor, conn, name)
+    conn.commit()
+    cursor.close()
+
+
+def canonicalize_states(cursor, conn, table):
+    # Rewrites the notebook's State spellings to the canonical names, so one
+    # state never gets two dim_state ids. Returns the (Year, Quarter) periods
+    # whose rows were re-keyed.
+    mark = '?' if is_sqlite(conn) else '%s'
+    ignore = 'OR IGNORE' if is_sqlite(conn) else 'IGNORE'
+    clear_ids = 'state_id = NULL, district_id = NULL' if table in DISTRICT_TABLES else 'state_id = NULL'
+    cursor.execute(f"SELECT DISTINCT State FROM `{table}` WHERE State IS NOT NULL")
+    periods = set()
+    for (raw,) in cursor.fetchall():
+        state = canonical_state(raw)
+        if state == raw:
+            continue
+        cursor.execute(f"SELECT DISTINCT Year, Quarter FROM `{table}` WHERE State = {mark}", (raw,))
+        periods.update(cursor.fetchall())
+        # A row whose key already exists under the canonical name is a stale copy
+        cursor.execute(f"UPDATE {ignore} `{table}` SET State = {mark}, {clear_ids} WHERE State = {mark}",
+                       (state, raw))
+        cursor.execute(f"DELETE FROM `{table}` WHERE State = {mark}", (raw,))
+    return periods
+
+
+def refresh_dimensions(cursor, conn, tables):
+    # Known states keep the fixed ids from normalize.STATE_IDS; returns the
+    # periods canonicalize_states() re-keyed
+    mark = '?' if is_sqlite(conn) else '%s'
+    periods = set()
+    for table in tables:
+        periods |= canonicalize_states(cursor, conn, table)
+    # Ids given to a non-canonical spelling by an earlier refresh
+    cursor.execute("SELECT state_id, State FROM dim_state")
+    stale = [(state_id,) for state_id, state in cursor.fetchall() if canonical_state(state) != state]
+    cursor.executemany(f"DELETE FROM dim_district WHERE state_id = {mark}", stale)
+    cursor.executemany(f"DELETE FROM dim_state WHERE state_id = {mark}", stale)
+
+    cursor.execute("SELECT state_id, State FROM dim_state")
+    existing = dict(cursor.fetchall())
+    cursor.executemany(f"INSERT INTO dim_state (state_id, State) VALUES ({mark}, {mark})",
+                       [(state_id, state) for state, state_id in STATE_IDS.items()
+                        if state not in existing.values() and state_id not in existing])
+    for table in tables:
+        cursor.execute(f"""INSERT INTO dim_state (State)
+                           SELECT DISTINCT State FROM `{table}`
+                           WHERE State NOT IN (SELECT State FROM dim_state)""")
+    for table in tables:
+        if table in DISTRICT_TABLES:
+            cursor.execute(f"""INSERT INTO dim_district (state_id, District)
+                               SELECT DISTINCT d.state_id, t.Districts
+                               FROM `{table}` t JOIN dim_state d ON d.State = t.State
+                               WHERE NOT EXISTS (SELECT 1 FROM dim_district x
+                                                 WHERE x.state_id = d.state_id AND x.District = t.Districts)""")
+
+    # Newly loaded rows get their integer keys
+    for table in tables:
+        cursor.execute(f"""UPDATE `{table}` SET state_id =
+                               (SELECT d.state_id FROM dim_state d WHERE d.State = `{table}`.State)
+                           WHERE state_id IS NULL""")
+        if table in DISTRICT_TABLES:
+            cursor.execute(f"""UPDATE `{table}` SET district_id =
+                                   (SELECT x.district_id FROM dim_district x
+                                    WHERE x.state_id = `{table}`.state_id AND x.District = `{table}`.Districts)
+                               WHERE district_id IS NULL""")
+    return periods
+
+
+def summary_select(table, group_columns, source=None, period=False):
+    measures = ', '.join(f'SUM({measure})' if measure in MEASURES[table] else '0'
+                         for measure in SUMMARY_MEASURES)
+    groups = ', '.join(group_columns)
+    columns = f"'{source}', {groups}" if source else groups
+    where = " WHERE Year = {mark} AND Quarter = {mark}" if period else ''
+    return f"SELECT {columns}, {measures} FROM `{table}`{where} GROUP BY {groups}"
+
+
+def summary_statements(tables):
+    # (summary table, INSERT ... SELECT with an optional period filter) for every source
+    measures = ', '.join(SUMMARY_MEASURES)
+    statements = []
+    for table in tables:
+        statements.append(('summary_state_quarter', f"""
+            INSERT INTO summary_state_quarter (source, state_id, Year, Quarter, {measures})
+            {summary_select(table, ['state_id', 'Year', 'Quarter'], table, True)}"""))
+        if table in DISTRICT_TABLES:
+            statements.append(('summary_state_district', f"""
+                INSERT INTO summary_state_district (source, state_id, district_id, Year, Quarter, {measures})
+                {summary_select(table, ['state_id', 'district_id', 'Year', 'Quarter'], table, True)}"""))
+    if 'transaction' in tables:
+        statements.append(('summary_state_payment', f"""
+            INSERT INTO summary_state_payment (state_id, name, Year, Quarter, {measures})
+            {summary_select('transaction', ['state_id', 'name', 'Year', 'Quarter'], period=True)}"""))
+    if 'agg_user' in tables:
+        statements.append(('summary_state_brand', f"""
+            INSERT INTO summary_state_brand (state_id, Brands, Year, Quarter, {measures})
+            {summary_select('agg_user', ['state_id', 'Brands', 'Year', 'Quarter'], period=True)}"""))
+    return statements
+
+
+def loaded_periods(cursor, tables):
+    periods = set()
+    for table in tables:
+        cursor.execute(f"SELECT DISTINCT Year, Quarter FROM `{table}`")
+        periods.update(cursor.fetchall())
+    return periods
+
+
+def refresh_summaries(conn, periods=None):
+    # periods is a set of (Year, Quarter); only those rows of the summaries are
+    # rebuilt, so loading one new quarter does not recompute the whole history
+    cursor = conn.cursor()
+    tables = [table for table in fact_tables() if table in existing_tables(cursor, conn)]
+    rekeyed = refresh_dimensions(cursor, conn, tables)
+
+    mark = '?' if is_sqlite(conn) else '%s'
+    if periods is None:
+        for summary in SUMMARY_TABLES:
+            cursor.execute(f"DELETE FROM {summary}")
+        periods = loaded_periods(cursor, tables)
+    else:
+        periods = set(periods) | rekeyed
+        for summary in SUMMARY_TABLES:
+            cursor.executemany(f"DELETE FROM {summary} WHERE Year = {mark} AND Quarter = {mark}",
+                               sorted(periods))
+
+    for summary, statement in summary_statements(tables):
+        cursor.executemany(statement.format(mark=mark), sorted(periods))
+    conn.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate the schema and refresh the summary tables')
+    parser.add_argument('--sqlite', help='SQLite file instead of MySQL')
+    parser.add_argument('--host', default=db.CONFIG['host'])
+    parser.add_argument('--user', default=db.CONFIG['user'])
+    parser.add_argument('--password', default=db.CONFIG['password'])
+    parser.add_argument('--database', default=db.CONFIG['database'])
+    args = parser.parse_args()
+
+    if args.sqlite:
+        conn = sqlite3.connect(args.sqlite)
+    else:
+        conn = db.connect(host=args.host, user=args.user, password=args.password, database=args.database)
+    migrate(conn)
+    refresh_summaries(conn)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import threading
+
+import pandas as pd
+
+import db
+import schema
+from ingest.specs import DATASETS
+
+# Columnar on-disk snapshot of the database, so the dashboard can start and
+# run without MySQL (PULSE_DATA_SOURCE=parquet).
+#
+# Fact tables are written as Parquet datasets partitioned by Year/Quarter,
+# so a read for one quarter only opens that quarter's files and only the
+# requested columns. The small dimension and summary tables are written as
+# single files and served to the Insights SQL from an in-memory SQLite copy.
+#
+#   python snapshot.py --tables transaction map_trans
+
+SNAPSHOT_DIR = os.environ.get('PULSE_SNAPSHOT_DIR',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot'))
+PARTITION_COLUMNS = ['Year', 'Quarter']
+FACT_TABLES = ['transaction', 'map_trans', 'top_transaction', 'agg_user', 'map_user', 'top_user', 'insurance']
+SUMMARY_TABLES = ['dim_state', 'dim_district'] + list(schema.SUMMARY_TABLES)
+
+_summary_conn = None
+_summary_lock = threading.Lock()
+
+
+def table_path(table):
+    return os.path.join(SNAPSHOT_DIR, table)
+
+
+def fact_columns(table):
+    return ['State', 'Year', 'Quarter'] + DATASETS[table].columns
+
+
+def write_table(table, df, partitioned):
+    # Written next to the live copy and swapped in, so readers never see half a table
+    path = table_path(table)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    if partitioned:
+        df.to_parquet(tmp_path, partition_cols=PARTITION_COLUMNS, index=False)
+    else:
+        os.makedirs(tmp_path)
+        df.to_parquet(os.path.join(tmp_path, 'part-0.parquet'), index=False)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def read_sql(sql, conn=None):
+    # The loader passes its own connection (MySQL or SQLite); otherwise the gateway is used
+    if conn is None:
+        return db.query(sql, name='export')
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        return pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+    finally:
+        cursor.close()
+
+
+def export(tables=None, conn=None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    for table in tables or FACT_TABLES + SUMMARY_TABLES:
+        if table in FACT_TABLES:
+            df = read_sql(f"SELECT {', '.join(fact_columns(table))} FROM `{table}`", conn)
+            write_table(table, df, partitioned=True)
+        else:
+            df = read_sql(f"SELECT * FROM {table}", conn)
+            write_table(table, df, partitioned=False)
+        print(f"{table}: {len(df)} rows")
+    reset_summary_connection()
+
+
+def read_table(table, columns=None, filters=None):
+    # Partition pruning on the filters, column projection on the columns
+    parquet_filters = [(column, '=', value) for column, value in (filters or {}).items()] or None
+    df = pd.read_parquet(table_path(table), columns=columns, filters=parquet_filters)
+    # Hive partition values come back as categoricals
+    for column in PARTITION_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype(int)
+    return df
+
+
+def reset_summary_connection():
+    global _summary_conn
+    with _summary_lock:
+        _summary_conn = None
+
+
+def summary_rows(sql, params=()):
+    global _summary_conn
+    with _summary_lock:
+        if _summary_conn is None:
+            conn = sqlite3.connect(':memory:', check_same_thread=False)
+            for table in SUMMARY_TABLES:
+                pd.read_parquet(table_path(table)).to_sql(table, conn, index=False)
+            _summary_conn = conn
+        return _summary_conn.execute(sql.replace('%s', '?'), params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the database to a Parquet snapshot')
+    parser.add_argument('--tables', nargs='*', choices=FACT_TABLES + SUMMARY_TABLES, help='default: all tables')
+    args = parser.parse_args()
+    export(args.tables)
+
+
+if __name__ == '__main__':
+    main()
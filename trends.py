@@ -0,0 +1,84 @@
+import pandas as pd
+
+import pulse_cache
+import pulse_data
+
+# Time-series trend views over the precomputed state x quarter and
+# state x district summary tables.
+#
+# The summaries are kept up to date one quarter at a time by the loader
+# (schema.refresh_summaries with the touched periods), so a whole-history
+# trend reads a table of states x quarters rows instead of re-grouping the
+# fact tables once per quarter. Growth, rolling sums and movers are computed
+# on a small period x state matrix.
+
+MEASURE_LABELS = {
+    'Transaction_amount': 'Transaction Amount',
+    'Transaction_count': 'Transaction Count',
+    'RegisteredUser': 'Registered Users',
+    'AppOpens': 'App Opens',
+}
+ROLLING_QUARTERS = 4
+
+
+def period_label(year, quarter):
+    return f'{year} Q{quarter}'
+
+
+def to_matrix(rows, group, measure):
+    # Period x group matrix with every quarter between the first and last present
+    df = pd.DataFrame(rows, columns=[group, 'Year', 'Quarter', measure])
+    df[measure] = df[measure].astype(float)
+    df['period'] = df['Year'].astype(int) * 4 + df['Quarter'].astype(int) - 1
+    matrix = df.pivot_table(index='period', columns=group, values=measure, aggfunc='sum')
+    if matrix.empty:
+        return matrix
+    matrix = matrix.reindex(range(matrix.index.min(), matrix.index.max() + 1))
+    matrix.index = [period_label(period // 4, period % 4 + 1) for period in matrix.index]
+    return matrix
+
+
+def state_cube(measure, source='transaction'):
+    def load():
+        rows = pulse_data.summary_rows(f"""SELECT d.State, s.Year, s.Quarter, s.{measure}
+                                           FROM summary_state_quarter s JOIN dim_state d ON d.state_id = s.state_id
+                                           WHERE s.source = %s""", (source,), name='trend_states')
+        return to_matrix(rows, 'State', measure)
+    return pulse_cache.cached(('state_cube', source, measure), load)
+
+
+def district_cube(state, measure, source='map_trans'):
+    def load():
+        rows = pulse_data.summary_rows(f"""SELECT x.District, s.Year, s.Quarter, s.{measure}
+                                           FROM summary_state_district s
+                                           JOIN dim_state d ON d.state_id = s.state_id
+                                           JOIN dim_district x ON x.district_id = s.district_id
+                                           WHERE s.source = %s AND d.State = %s""",
+                                       (source, str(state)), name='trend_districts')
+        return to_matrix(rows, 'District', measure)
+    return pulse_cache.cached(('district_cube', source, str(state), measure), load)
+
+
+def growth(matrix, quarters):
+    # quarters=1 is quarter-over-quarter, quarters=4 is year-over-year, in percent
+    return matrix.pct_change(periods=quarters, fill_method=None) * 100
+
+
+def rolling_sum(matrix, quarters=ROLLING_QUARTERS):
+    return matrix.rolling(quarters, min_periods=quarters).sum()
+
+
+def top_movers(matrix, quarters=1, n=5):
+    # Largest rises and falls in the latest period with a growth figure; a
+    # name only counts as a riser when it grew and as a faller when it shrank
+    change = growth(matrix, quarters).dropna(how='all')
+    if change.empty:
+        return pd.DataFrame(columns=['name', 'growth']), pd.DataFrame(columns=['name', 'growth'])
+    latest = change.iloc[-1].dropna().rename_axis('name').reset_index(name='growth')
+    risers = latest[latest['growth'] > 0].nlargest(n, 'growth')
+    fallers = latest[latest['growth'] < 0].nsmallest(n, 'growth')
+    return risers.reset_index(drop=True), fallers.reset_index(drop=True)
+
+
+def long_format(matrix, group, value):
+    return matrix.rename_axis('Period').reset_index().melt(id_vars='Period', var_name=group, value_name=value)